@@ -0,0 +1,152 @@
+# solves lots of (start, end) pairs on one grid across a process pool, for offline jobs
+# the grid's cells go into a multiprocessing.shared_memory block once and every worker
+# builds its pathengine.Grid straight on top of it, so no worker gets its own copy of the map
+# (each one still keeps its own masks, component labels and search workspace, those are per search)
+# a grid with terrain weights puts its weights in the same block right after the cells
+# solve() also takes the path of a scenario file (see scenario.py) instead of a grid, then there's no block:
+# every worker maps the file itself (the os shares the pages) and unpacks it into its own grid once
+
+# About the results
+# lengths is an array('i') with one entry per query, the number of steps or -1 when there's no path
+# costs is an array('q') with the sum of the weights along each path (the same as lengths without terrain)
+# with paths=True every path is stored as flat cell indices one after the other in cells,
+# query k's path is cells[offsets[k]:offsets[k + 1]] (empty when there's no path)
+
+# usage from code:
+#     result = batch.solve(grid, [((0, 0), (9, 9)), ...], algorithm="astar", workers=4, paths=True)
+#     result.lengths[0], result.path(0)
+#     result = batch.solve("scenario.pgs", workers=4) # the scenario's own queries
+# the pool uses processes, so scripts that call solve() need an if __name__ == "__main__": guard
+
+import os
+from array import array
+from multiprocessing import Pool, shared_memory
+
+import pathengine
+import scenario
+
+CHUNKS_PER_WORKER = 4 # a few chunks each so a worker that got the slow queries doesn't hold everyone up
+
+class BatchResult:
+    def __init__(self, lengths, costs, offsets=None, cells=None, cols=0):
+        self.lengths = lengths
+        self.costs = costs
+        self.offsets = offsets
+        self.cells = cells
+        self.cols = cols
+
+    def __len__(self):
+        return len(self.lengths)
+
+    # the path of query k as a list of (row, col), like SearchResult.path
+    def path(self, k):
+        if self.offsets is None:
+            raise ValueError("solve() was called without paths=True")
+        return [divmod(index, self.cols) for index in self.cells[self.offsets[k]:self.offsets[k + 1]]]
+
+# each worker process keeps these from the initializer for all its chunks
+_worker = {}
+
+def _init_worker(name, rows, cols, max_weight, algorithm, options, paths):
+    memory = shared_memory.SharedMemory(name=name)
+    _worker["memory"] = memory # has to stay referenced or the buffer goes away
+    size = rows * cols # the block can be rounded up to a page
+    grid = pathengine.Grid(rows, cols, memory.buf[:size])
+    if max_weight > 1:
+        grid.weights = memory.buf[size:2 * size]
+        grid.max_weight = max_weight
+    _keep(grid, algorithm, options, paths)
+
+def _init_scenario_worker(path, algorithm, options, paths):
+    with scenario.load(path) as saved:
+        _keep(saved.grid(), algorithm, options, paths)
+
+def _keep(grid, algorithm, options, paths):
+    _worker["grid"] = grid
+    _worker["search"] = pathengine.ALGORITHMS[algorithm]
+    _worker["options"] = options
+    _worker["paths"] = paths
+
+def _solve_chunk(queries):
+    return _solve(_worker["grid"], _worker["search"], _worker["options"], _worker["paths"], queries)
+
+def _solve(grid, search, options, paths, queries):
+    grid.components() # labeled on the first chunk only, the searches need them built to skip walled off pairs
+    lengths = array("i")
+    costs = array("q")
+    cells = array("i") if paths else None
+    for start, end in queries:
+        result = search(grid, start, end, **options)
+        lengths.append(result.length)
+        costs.append(result.cost)
+        if paths:
+            cells.extend(grid.index(row, col) for row, col in result.path)
+    return lengths, costs, cells
+
+def _chunks(queries, workers):
+    chunk = -(-len(queries) // (workers * CHUNKS_PER_WORKER))
+    return [queries[lo:lo + chunk] for lo in range(0, len(queries), chunk)]
+
+# grid is a pathengine.Grid or the path of a scenario file
+# queries is a list of ((start_row, start_col), (end_row, end_col)), it can be left out for a scenario file
+# to use the queries saved in it
+# workers defaults to the number of cores, with 1 worker (or 1 query) everything runs right here in this process
+def solve(grid, queries=None, algorithm="astar", workers=None, paths=False, **options):
+    if algorithm not in pathengine.ALGORITHMS:
+        raise ValueError("unknown algorithm %r, expected one of %s" % (algorithm, ", ".join(pathengine.ALGORITHMS)))
+    path = None
+    if not isinstance(grid, pathengine.Grid):
+        path = os.fspath(grid)
+        with scenario.load(path) as saved:
+            cols = saved.cols
+            if queries is None:
+                queries = saved.query_pairs()
+    elif queries is None:
+        raise ValueError("queries can only be left out when grid is a scenario file")
+    else:
+        cols = grid.cols
+    queries = list(queries)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(queries)))
+
+    if workers == 1:
+        if path is not None:
+            with scenario.load(path) as saved:
+                grid = saved.grid()
+        parts = [_solve(grid, pathengine.ALGORITHMS[algorithm], options, paths, queries)]
+    elif path is not None:
+        chunks = _chunks(queries, workers)
+        with Pool(workers, _init_scenario_worker, (path, algorithm, options, paths)) as pool:
+            parts = pool.map(_solve_chunk, chunks)
+    else:
+        chunks = _chunks(queries, workers)
+        size = len(grid)
+        memory = shared_memory.SharedMemory(create=True, size=2 * size if grid.weighted else size)
+        try:
+            memory.buf[:size] = grid.cells
+            if grid.weighted:
+                memory.buf[size:2 * size] = grid.weights
+            max_weight = grid.max_weight if grid.weighted else 1
+            with Pool(workers, _init_worker, (memory.name, grid.rows, grid.cols, max_weight, algorithm, options, paths)) as pool:
+                parts = pool.map(_solve_chunk, chunks) # map keeps the chunks in query order
+        finally:
+            memory.close()
+            memory.unlink()
+
+    lengths = array("i")
+    costs = array("q")
+    for part_lengths, part_costs, _ in parts:
+        lengths.extend(part_lengths)
+        costs.extend(part_costs)
+    if not paths:
+        return BatchResult(lengths, costs, cols=cols)
+    cells = array("i")
+    for _, _, part_cells in parts:
+        cells.extend(part_cells)
+    offsets = array("q", [0]) * (len(lengths) + 1)
+    total = 0
+    for k, length in enumerate(lengths):
+        total += length + 1 if length >= 0 else 0 # a path has one more cell than it has steps
+        offsets[k + 1] = total
+    return BatchResult(lengths, costs, offsets, cells, cols)
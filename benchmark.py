@@ -0,0 +1,195 @@
+# reproducible benchmark for the pathengine searches, no pygame needed
+# every maze and every start/end pair comes from a seeded random.Random so two runs
+# (or two versions of the code) solve exactly the same problems
+# for each maze size, barrier density and algorithm it records wall time, nodes expanded,
+# the biggest the open set got and peak memory, and writes it all to a json file
+# so the numbers can be diffed between versions
+
+# usage: python benchmark.py [--sizes 64 256] [--densities 0.1 0.2 0.3] [--queries 50] [--seed 1] [--out benchmark.json]
+#        python benchmark.py --scenario slow_case.pgs [...] to rerun saved scenarios (scenario.py)
+#        --max-weight 9 gives the mazes random terrain weights (only astar, dijkstra and dial run then)
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pathengine
+import scenario
+
+# name -> (engine function, extra keyword arguments)
+ENGINES = {
+    "astar_manhattan": (pathengine.astar, {"heuristic": "manhattan"}),
+    "astar_euclidean": (pathengine.astar, {"heuristic": "euclidean"}),
+    "astar_alt": (pathengine.astar, {"heuristic": "alt"}),
+    "dijkstra": (pathengine.dijkstra, {}),
+    "dial": (pathengine.dial, {}),
+    "bfs": (pathengine.bfs, {}),
+    "jps": (pathengine.jps, {}),
+    "bidirectional_astar": (pathengine.bidirectional_astar, {}),
+    "bidirectional_dijkstra": (pathengine.bidirectional_dijkstra, {}),
+}
+
+# same idea as randMaze in pathfinding.py (density is the chance a cell is a barrier) but seeded
+# with max_weight above 1 every cell also gets a random terrain weight from 1 to max_weight,
+# drawn after the barriers so the barriers are the same as without weights
+def make_maze(size, density, seed, max_weight=1):
+    rng = random.Random(seed)
+    grid = pathengine.Grid(size)
+    cells = grid.cells
+    for index in range(len(grid)):
+        if rng.random() < density:
+            cells[index] = pathengine.BARRIER
+    grid.rebuild_masks()
+    if max_weight > 1:
+        for index in range(len(grid)):
+            grid.set_weight(*grid.pos(index), rng.randint(1, max_weight))
+    return grid
+
+# start/end pairs on free cells, some of them won't be connected and that's on purpose
+def make_queries(grid, count, seed):
+    rng = random.Random(seed)
+    free = [index for index in range(len(grid)) if grid.cells[index] == pathengine.FREE]
+    if not free:
+        return []
+    return [(grid.pos(rng.choice(free)), grid.pos(rng.choice(free))) for _ in range(count)]
+
+def run_engine(search, options, grid, queries):
+    costs = []
+    expanded = 0
+    peak_open = 0
+    began = time.perf_counter()
+    for start, end in queries:
+        result = search(grid, start, end, **options)
+        costs.append(result.cost) # the same as the length without weights
+        expanded += result.expanded
+        peak_open = max(peak_open, result.peak_open)
+    elapsed = time.perf_counter() - began
+
+    # memory gets its own pass, tracemalloc slows everything down too much to time with it on
+    # the push and stale pop counts come from the same pass (the hooks cost time too)
+    counts = pathengine.SearchStats()
+    tracemalloc.start()
+    for start, end in queries:
+        search(grid, start, end, hooks=counts, **options)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "seconds": elapsed,
+        "ms_per_query": 1000 * elapsed / max(1, len(queries)),
+        "queries_per_second": len(queries) / elapsed if elapsed else None,
+        "found": sum(cost >= 0 for cost in costs),
+        "expanded_total": expanded,
+        "expanded_mean": expanded / max(1, len(queries)),
+        "pushed_total": counts.pushed,
+        "stale_total": counts.stale,
+        "peak_open": peak_open,
+        "peak_memory_bytes": peak_memory,
+    }, costs
+
+def git_revision():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# every engine on one grid and one list of queries, case has the fields that go in every result
+def run_case(grid, pairs, engines, case, label):
+    results = []
+    grid.workspace(0) # allocate the scratch arrays up front so the first engine doesn't pay for them
+    grid.workspace(1)
+    grid.components() # the searches only skip walled off pairs when the labels are already built
+    # the landmark tables are built once per maze and shared by every query, time them on their own
+    # (only when something uses them, on a big maze they take longer than all the searches)
+    landmark_ms = None
+    if "astar_alt" in engines:
+        build_start = time.perf_counter()
+        grid.landmarks()
+        landmark_ms = (time.perf_counter() - build_start) * 1000
+    reference = None
+    for name in engines:
+        search, options = ENGINES[name]
+        if grid.weighted and search.__name__ not in pathengine.WEIGHTED:
+            continue # counts steps, not weights
+        stats, costs = run_engine(search, options, grid, pairs)
+        # every engine is optimal, so they all have to agree with the first one
+        if reference is None:
+            reference = costs
+        stats["mismatches"] = sum(a != b for a, b in zip(costs, reference))
+        stats.update({"algorithm": name, "queries": len(pairs)})
+        stats.update(case)
+        if options.get("heuristic") == "alt":
+            stats["landmark_build_ms"] = landmark_ms
+        results.append(stats)
+        print("%-24s %s  %8.3f ms/query  %10.1f expanded  peak open %7d  %9d bytes%s" % (
+            name, label, stats["ms_per_query"], stats["expanded_mean"],
+            stats["peak_open"], stats["peak_memory_bytes"],
+            "  %d MISMATCHES" % stats["mismatches"] if stats["mismatches"] else ""))
+    return results
+
+def run(sizes, densities, queries, seed, engines, max_weight=1):
+    results = []
+    for size in sizes:
+        for density in densities:
+            # the maze seed depends on the case, not on the order the cases run in
+            case_seed = seed * 1000003 + size * 101 + round(density * 1000)
+            grid = make_maze(size, density, case_seed, max_weight)
+            pairs = make_queries(grid, queries, case_seed + 1)
+            results += run_case(grid, pairs, engines, {"size": size, "density": density},
+                                "%5dx%-5d density %.2f" % (size, size, density))
+    return results
+
+# a saved scenario (see scenario.py) instead of generated mazes, its own queries are used if it has any,
+# otherwise its start/end, otherwise seeded random ones
+def run_scenario(path, queries, seed, engines):
+    with scenario.load(path) as saved:
+        grid = saved.grid()
+        pairs = saved.query_pairs()
+        if not pairs and saved.start is not None and saved.end is not None:
+            pairs = [(saved.start, saved.end)]
+    if not pairs:
+        pairs = make_queries(grid, queries, seed)
+    return run_case(grid, pairs, engines, {"scenario": path, "rows": grid.rows, "cols": grid.cols},
+                    "%s (%dx%d)" % (path, grid.rows, grid.cols))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pathengine searches on seeded random mazes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.1, 0.2, 0.3])
+    parser.add_argument("--queries", type=int, default=50, help="start/end pairs per maze")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(ENGINES), default=list(ENGINES))
+    parser.add_argument("--max-weight", type=int, default=1,
+                        help="random terrain weights from 1 to this (only the engines that use weights run)")
+    parser.add_argument("--scenario", nargs="+", help="run on saved scenario files instead of random mazes")
+    parser.add_argument("--out", default="benchmark.json")
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        results = []
+        for path in args.scenario:
+            results += run_scenario(path, args.queries, args.seed, args.algorithms)
+    else:
+        results = run(args.sizes, args.densities, args.queries, args.seed, args.algorithms, args.max_weight)
+    report = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "revision": git_revision(),
+        "settings": {"sizes": args.sizes, "densities": args.densities, "queries": args.queries, "seed": args.seed,
+                     "max_weight": args.max_weight,
+                     "scenarios": args.scenario},
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("wrote", args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# maze generators that write barriers straight into a pathengine.Grid's cells, no pygame in here
+# the cells bytearray gets wrapped in a numpy view (no copy) so the whole layout is set in
+# a few array operations instead of one python call per cell, then the masks are rebuilt once
+# every generator takes a seed so the same seed gives the same maze
+
+# About the perfect mazes
+# recursive_backtracker, kruskal and binary_tree make perfect mazes: every free cell can reach
+# every other one by exactly one path, so any start/end pair is solvable
+# rooms sit on the odd (row, col) cells and the even cells between two rooms are the walls that get knocked out,
+# so the outside edge always stays barrier (with an even number of rows or cols the last one stays barrier too)
+# the backtracker makes long winding corridors, kruskal lots of short dead ends,
+# binary_tree is fully vectorized (fastest) but always has a straight corridor along the top and left
+
+import numpy as np
+
+import pathengine
+
+def cell_view(grid):
+    return np.frombuffer(grid.cells, dtype=np.uint8).reshape(grid.rows, grid.cols)
+
+# every cell is a barrier with probability density, like the old randMaze
+def random_density(grid, density=0.2, seed=None):
+    rng = np.random.default_rng(seed)
+    cell_view(grid)[:] = rng.random((grid.rows, grid.cols)) < density
+    grid.rebuild_masks()
+
+# barriers all the way around the outside, like the old fill_edges
+def border(grid):
+    view = cell_view(grid)
+    view[0, :] = view[-1, :] = pathengine.BARRIER
+    view[:, 0] = view[:, -1] = pathengine.BARRIER
+    grid.rebuild_masks()
+
+# all barrier except the rooms, gives back the number of room rows and cols
+def _rooms(grid):
+    view = cell_view(grid)
+    view[:] = pathengine.BARRIER
+    room_rows, room_cols = (grid.rows - 1) // 2, (grid.cols - 1) // 2
+    view[1:2 * room_rows:2, 1:2 * room_cols:2] = pathengine.FREE
+    return room_rows, room_cols
+
+# the flat cell index of every room, room k is (k // room_cols, k % room_cols)
+def _room_cells(grid, room_rows, room_cols):
+    rows = np.arange(room_rows) * 2 + 1
+    cols = np.arange(room_cols) * 2 + 1
+    return (rows[:, None] * grid.cols + cols[None, :]).ravel().tolist()
+
+# depth first from a random room, always going to a random unvisited neighbor and
+# backing up when there are none, the stack is a list so big mazes can't hit the recursion limit
+# the rooms get a ring of already visited rooms around them so there are no bounds checks in the loop
+def recursive_backtracker(grid, seed=None):
+    rng = np.random.default_rng(seed)
+    room_rows, room_cols = _rooms(grid)
+    count = room_rows * room_cols
+    if count:
+        cells = grid.cells
+        width = room_cols + 2
+        visited = np.ones((room_rows + 2, width), dtype=np.uint8)
+        visited[1:-1, 1:-1] = 0
+        visited = bytearray(visited.tobytes())
+        # the cell of padded room (row, col) is (2 * row - 1, 2 * col - 1), the ring's entries are never used
+        room_cell = ((np.arange(room_rows + 2)[:, None] * 2 - 1) * grid.cols
+                     + np.arange(width)[None, :] * 2 - 1).ravel().tolist()
+        picks = rng.random(count).tolist() # a room gets at most one pick every time it's carved into
+        pick = 0
+        first = (int(rng.integers(room_rows)) + 1) * width + int(rng.integers(room_cols)) + 1
+        visited[first] = 1
+        stack = [first]
+        while stack:
+            room = stack[-1]
+            options = []
+            if not visited[room - width]:
+                options.append(room - width)
+            if not visited[room + width]:
+                options.append(room + width)
+            if not visited[room - 1]:
+                options.append(room - 1)
+            if not visited[room + 1]:
+                options.append(room + 1)
+            if not options:
+                stack.pop()
+                continue
+            following = options[int(picks[pick] * len(options))]
+            pick += 1
+            visited[following] = 1
+            cells[(room_cell[room] + room_cell[following]) // 2] = pathengine.FREE # the wall between them
+            stack.append(following)
+    grid.rebuild_masks()
+
+# every wall between two rooms in a random order, a wall gets knocked out when the rooms
+# on its two sides aren't connected yet (union-find over the rooms)
+def kruskal(grid, seed=None):
+    rng = np.random.default_rng(seed)
+    room_rows, room_cols = _rooms(grid)
+    count = room_rows * room_cols
+    if count:
+        cells = grid.cells
+        room_cell = _room_cells(grid, room_rows, room_cols)
+        rooms = np.arange(count).reshape(room_rows, room_cols)
+        first = np.concatenate((rooms[:, :-1].ravel(), rooms[:-1, :].ravel())) # left or upper room of each wall
+        second = np.concatenate((rooms[:, 1:].ravel(), rooms[1:, :].ravel()))
+        order = rng.permutation(len(first))
+        parent = list(range(count))
+        for a, b in zip(first[order].tolist(), second[order].tolist()):
+            root_a = a
+            while parent[root_a] != root_a:
+                parent[root_a] = parent[parent[root_a]]
+                root_a = parent[root_a]
+            root_b = b
+            while parent[root_b] != root_b:
+                parent[root_b] = parent[parent[root_b]]
+                root_b = parent[root_b]
+            if root_a != root_b:
+                parent[root_a] = root_b
+                cells[(room_cell[a] + room_cell[b]) // 2] = pathengine.FREE
+    grid.rebuild_masks()
+
+# every room knocks out its wall up or its wall left at random (the top row can only go left
+# and the left column only up), no loops in python at all
+def binary_tree(grid, seed=None):
+    rng = np.random.default_rng(seed)
+    room_rows, room_cols = _rooms(grid)
+    if room_rows and room_cols:
+        view = cell_view(grid)
+        up = rng.random((room_rows, room_cols)) < 0.5
+        up[0, :] = False
+        up[:, 0] = True
+        up[0, 0] = False # the corner room has nowhere to go, everyone else reaches it
+        left = ~up
+        left[0, 0] = False
+        up_walls = view[0:2 * room_rows:2, 1:2 * room_cols:2] # the cell above each room
+        left_walls = view[1:2 * room_rows:2, 0:2 * room_cols:2] # the cell left of each room
+        up_walls[up] = pathengine.FREE
+        left_walls[left] = pathengine.FREE
+    grid.rebuild_masks()
+
+GENERATORS = {
+    "random": random_density,
+    "backtracker": recursive_backtracker,
+    "kruskal": kruskal,
+    "binary_tree": binary_tree,
+}
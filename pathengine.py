@@ -0,0 +1,1203 @@
+# headless path finding engine, there's no pygame in here
+# so it can be used for batch jobs and the visualizer just draws what it reports
+
+# About the grid
+# the grid is a flat bytearray, cell (row, col) lives at index row * cols + col
+# 0 is a free cell and 1 is a barrier, every step costs 1 like in the visualizer (unless there's terrain, see About weights)
+# searches take (row, col) tuples for start and end and give back a SearchResult
+# with the path (list of (row, col) from start to end) and how many nodes were expanded
+# a start or end outside the grid or on a barrier is a ValueError, for every search (and replan's LPA*)
+
+# About the adjacency
+# next to the cells every grid keeps a mask per cell with one bit per direction
+# (DOWN, UP, RIGHT, LEFT) that is set when that neighbor exists and isn't a barrier
+# set_barrier fixes the masks of the four neighbors in O(1), so searches never rebuild a graph,
+# they just look up steps[masks[index]] to get the offsets of the cells they can move to
+# if cells gets written directly (not through set_barrier) call rebuild_masks afterwards
+
+# About weights
+# a grid can have terrain: grid.weights is a bytearray with the cost (1 to 255) of stepping onto each cell,
+# it stays None until set_weight gives some cell a cost other than 1, so plain grids don't pay for it
+# astar, dijkstra and dial (and replan's LPA*) add up the weights, result.cost is the total,
+# bfs, jps and the bidirectional searches assume every step costs 1 and raise ValueError on a weighted grid
+# (WEIGHTED has the names of the ones that don't), every weight is at least 1 so the heuristics
+# (and the landmark tables, which count steps) still never guess too high
+
+# About stepping
+# every search is written as a generator (astar_steps, dijkstra_steps, ...) that yields once per
+# expanded node and returns its SearchResult when it's done, so a caller like the visualizer can
+# run it a few milliseconds at a time and just drop it to cancel
+# astar, dijkstra, ... are the same searches run straight through with finish()
+
+# About landmarks (the "alt" heuristic)
+# manhattan distance doesn't know about barriers, so around walls it's a weak guess
+# grid.landmarks() picks a few cells spread over the map and stores a BFS distance table from each one,
+# by the triangle inequality |d(L, end) - d(L, n)| <= d(n, end) for every landmark L, so the biggest
+# of those is still a lower bound but it sees the walls, and A* with it expands far fewer cells
+# every barrier change bumps grid.version and the tables get rebuilt the next time they're asked for
+# that's 8 BFS passes over the whole grid (tens of seconds at 2000x2000), so anything on a frame budget
+# builds them with grid.landmarks_steps() before the search instead of letting astar_steps do it
+
+# About components
+# grid.components() labels every free cell with the open area (connected component) it belongs to,
+# the searches check it first so a start and end walled off from each other give "no path" in O(1)
+# instead of flooding everything the start can reach
+# set_barrier keeps the labels up to date: removing a barrier joins the areas around it (union-find),
+# adding one only removes the cell unless it might cut an area in two, then it's relabeled on the next query
+# labeling is a flood fill over the whole grid, so the searches only use labels that are already built and
+# up to date, they never build them: callers that want the shortcut call grid.components() first
+# (benchmark.py and batch.py once per grid, the visualizer through grid.components_steps() a bit every frame)
+
+# About hooks
+# every search also takes hooks=, an object with on_push(index, open_size) for every entry put on the open set,
+# on_stale(index) for every entry that comes off it already closed (lazy deletion leftovers),
+# on_expand(index) for every expanded cell and on_time(seconds) for how long finish() ran the search
+# (subclass Hooks and override what you need), SearchStats is one that just counts everything
+# with hooks=None (the default) the searches don't call anything
+
+# About the self check
+# python pathengine.py makes small random grids and flips random barriers one at a time through set_barrier,
+# after every flip the kept up to date component labels have to describe the same areas (and sizes) as a
+# fresh labeling, it stops with an AssertionError at the first flip where they don't
+
+# About the search state
+# the scores and parents live in preallocated arrays indexed by the flat cell index (Workspace)
+# instead of dicts built for every query, they are never cleared: every search bumps a
+# generation counter and a cell's entry only counts if its stamp matches the current generation
+# everything is 32 bit (16 bytes a cell, 64 MB for 2000x2000) unless a path could cost more than an int32 holds
+# (every cell at the top weight 255 on a grid over about 8 million cells), then g_score is 64 bit
+
+import heapq
+import math
+import random
+import sys
+import time
+from array import array
+from collections import deque
+
+FREE = 0
+BARRIER = 1
+
+DOWN = 1
+UP = 2
+RIGHT = 4
+LEFT = 8
+
+_FREE_TABLE = bytes([1]) + bytes(255) # translate table, free cells -> 1 and barriers -> 0
+
+YIELD_EVERY = 1024 # about how many cells the table builders (components_steps, landmarks_steps) go through between yields
+
+class Grid:
+    def __init__(self, rows, cols=None, cells=None):
+        self.rows = rows
+        self.cols = rows if cols is None else cols
+        if cells is None:
+            cells = bytearray(self.rows * self.cols)
+        if len(cells) != self.rows * self.cols:
+            raise ValueError("cells has %d entries, expected %d" % (len(cells), self.rows * self.cols))
+        self.cells = cells
+        cols = self.cols
+        offsets = ((DOWN, cols), (UP, -cols), (RIGHT, 1), (LEFT, -1))
+        self.steps = [tuple(step for bit, step in offsets if mask & bit) for mask in range(16)]
+        self.masks = bytearray(len(self))
+        self.version = 0 # goes up on every barrier change, anything built from the barriers checks it
+        self.rebuild_masks()
+        self._workspaces = []
+        self._landmarks = None
+        self._components = None
+        self._jump_tables = None
+        self.weights = None # see About weights
+        self.max_weight = 1 # at least as big as every weight, dial sizes its buckets with it
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def pos(self, index):
+        return divmod(index, self.cols)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def is_barrier(self, row, col):
+        return self.cells[row * self.cols + col] == BARRIER
+
+    # the cell's own mask doesn't change, only the bits its neighbors have pointing at it
+    def set_barrier(self, row, col, barrier=True):
+        index = row * self.cols + col
+        value = BARRIER if barrier else FREE
+        if self.cells[index] == value:
+            return
+        self.cells[index] = value
+        self.version += 1
+        masks = self.masks
+        cols = self.cols
+        if row > 0: # the cell above reaches this one by going down
+            masks[index - cols] ^= DOWN
+        if row < self.rows - 1:
+            masks[index + cols] ^= UP
+        if col > 0:
+            masks[index - 1] ^= RIGHT
+        if col < cols - 1:
+            masks[index + 1] ^= LEFT
+        if self._components is not None:
+            self._components.cell_changed(index)
+
+    @property
+    def weighted(self):
+        return self.weights is not None
+
+    def weight(self, row, col):
+        return 1 if self.weights is None else self.weights[row * self.cols + col]
+
+    # the cost of stepping onto (row, col), barriers keep theirs for when they're removed
+    def set_weight(self, row, col, weight):
+        if not 1 <= weight <= 255:
+            raise ValueError("weight %r is outside 1..255" % (weight,))
+        if self.weights is None:
+            if weight == 1:
+                return
+            self.weights = bytearray(b"\x01") * len(self)
+        self.weights[row * self.cols + col] = weight
+        if weight > self.max_weight:
+            self.max_weight = weight
+
+    def clear_weights(self):
+        self.weights = None
+        self.max_weight = 1
+
+    # recomputes every mask from cells in one go, the grid is treated as one big integer
+    # with a byte per cell so each direction is a single shift instead of a python loop
+    def rebuild_masks(self):
+        size = len(self)
+        cols = self.cols
+        every = (1 << (8 * size)) - 1
+        free = int.from_bytes(bytes(self.cells).translate(_FREE_TABLE), "little")
+        not_last_col = int.from_bytes((b"\x01" * (cols - 1) + b"\x00") * self.rows, "little")
+        not_first_col = int.from_bytes((b"\x00" + b"\x01" * (cols - 1)) * self.rows, "little")
+        down = free >> (8 * cols)
+        up = (free << (8 * cols)) & every
+        right = (free >> 8) & not_last_col
+        left = (free << 8) & not_first_col
+        masks = down | (up << 1) | (right << 2) | (left << 3)
+        self.masks[:] = masks.to_bytes(size, "little")
+        self.version += 1
+
+    # down, up, right, left like the old Spot.update_neighbors
+    def neighbors(self, index):
+        return [index + step for step in self.steps[self.masks[index]]]
+
+    # scratch arrays for searching this grid, made once and reused by every query
+    # searches that need two sets at once (the bidirectional ones) ask for slot 1 as well
+    def workspace(self, slot=0):
+        while len(self._workspaces) <= slot:
+            self._workspaces.append(Workspace(len(self)))
+        return self._workspaces[slot]
+
+    # connected component labels, built the first time and kept up to date by set_barrier
+    def components(self):
+        return finish(self.components_steps())
+
+    # the same as components() but yields every so often while it labels, for callers on a frame budget
+    def components_steps(self):
+        if self._components is None:
+            self._components = Components(self)
+        if not self._components.current:
+            yield from self._components.relabel_steps()
+        return self._components
+
+    # distance tables for the "alt" heuristic, built the first time and again after barriers change
+    def landmarks(self, count=8):
+        return finish(self.landmarks_steps(count))
+
+    # the same as landmarks() but yields every so often while it builds (8 BFS passes over the whole grid),
+    # the tables only get kept once they're done so dropping it halfway just means building them next time
+    def landmarks_steps(self, count=8):
+        if self._landmarks is None or self._landmarks.version != self.version or self._landmarks.count != count:
+            landmarks = Landmarks(self, count)
+            yield from landmarks.build_steps()
+            self._landmarks = landmarks
+        return self._landmarks
+
+    # where jps's horizontal slides stop (see About jump point search), rebuilt after barriers change
+    def jump_tables(self):
+        return finish(self.jump_tables_steps())
+
+    # the same as jump_tables() but yields between blocks of rows
+    def jump_tables_steps(self):
+        if self._jump_tables is None or self._jump_tables.version != self.version:
+            tables = JumpTables(self)
+            yield from tables.build_steps()
+            self._jump_tables = tables
+        return self._jump_tables
+
+# steps from source to every cell, -1 where it can't get to
+def bfs_distances(grid, source):
+    return finish(bfs_distances_steps(grid, source))
+
+# yields after every YIELD_EVERY or so cells, at the end of a layer
+def bfs_distances_steps(grid, source):
+    steps, masks = grid.steps, grid.masks
+    distance = array("i", [-1]) * len(grid)
+    distance[source] = 0
+    frontier = [source]
+    depth = 0
+    reached = 0
+    mark = YIELD_EVERY
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for current in frontier:
+            for step in steps[masks[current]]:
+                neighbor = current + step
+                if distance[neighbor] == -1:
+                    distance[neighbor] = depth
+                    next_frontier.append(neighbor)
+        reached += len(frontier)
+        if reached >= mark:
+            mark = reached + YIELD_EVERY
+            yield
+        frontier = next_frontier
+    return distance
+
+class Landmarks:
+    SLICE = 1 << 14 # cells per slice when going over a whole table, there's a yield between slices
+
+    # nothing is built until build_steps (or grid.landmarks()) runs
+    def __init__(self, grid, count=8):
+        self.grid = grid
+        self.count = count
+        self.version = grid.version
+        self.cells = []
+        self.tables = []
+
+    # the landmarks go in the biggest open area (a random maze has lots of little walled in pockets)
+    # and are picked farthest-first: the first one is the cell farthest from a seed cell,
+    # every next one is the cell farthest from all the landmarks so far
+    def build_steps(self):
+        grid = self.grid
+        components = yield from grid.components_steps()
+        seed = components.largest()
+        if seed == -1:
+            return
+        nearest = yield from bfs_distances_steps(grid, seed) # distance from each cell to its closest landmark
+        size, piece = len(nearest), self.SLICE
+        for _ in range(self.count):
+            farthest, landmark = -1, -1
+            for low in range(0, size, piece):
+                part = nearest[low:low + piece]
+                top = max(part)
+                if top > farthest:
+                    farthest, landmark = top, low + part.index(top)
+                yield
+            if farthest <= 0 and self.tables:
+                break # everything reachable already is a landmark
+            table = yield from bfs_distances_steps(grid, landmark)
+            self.cells.append(landmark)
+            self.tables.append(table)
+            closest = array("i")
+            for low in range(0, size, piece):
+                closest.extend(map(min, nearest[low:low + piece], table[low:low + piece]))
+                yield
+            nearest = closest
+
+    # lower bound on the steps from (row, col) to (target_row, target_col), same signature as manhattan
+    # if a landmark reaches only one of the two cells they aren't connected at all and the bound is inf
+    def bound(self, row, col, target_row, target_col):
+        cols = self.grid.cols
+        index = row * cols + col
+        target = target_row * cols + target_col
+        best = abs(row - target_row) + abs(col - target_col) # manhattan is a lower bound too, keep the bigger one
+        for table in self.tables:
+            here, there = table[index], table[target]
+            if (here == -1) != (there == -1):
+                return math.inf
+            if here - there > best:
+                best = here - there
+            elif there - here > best:
+                best = there - here
+        return best
+
+class Components:
+    # nothing is labeled until relabel (or grid.components()) runs
+    def __init__(self, grid):
+        self.grid = grid
+        self.labels = None
+        self.sizes = []
+        self.parent = []
+        self.version = -1
+
+    @property
+    def current(self):
+        return self.version == self.grid.version
+
+    def relabel(self):
+        finish(self.relabel_steps())
+
+    # flood fills every free cell, labels[index] is the component number or -1 for a barrier
+    # parent and size are the union-find over the labels, a fresh labeling has every label as its own root
+    # nothing changes until it's done, so dropping it halfway leaves the old labels (still out of date)
+    def relabel_steps(self):
+        grid = self.grid
+        steps, masks, cells = grid.steps, grid.masks, grid.cells
+        every = YIELD_EVERY
+        version = grid.version # if the grid changes while this runs the labels come out already out of date
+        labels = array("i", [-1]) * len(grid)
+        sizes = []
+        for first in range(len(cells)):
+            if not first % every:
+                yield
+            if cells[first] != FREE or labels[first] != -1:
+                continue
+            label = len(sizes)
+            labels[first] = label
+            stack = [first]
+            size = 0
+            while stack:
+                current = stack.pop()
+                size += 1
+                if not size % every:
+                    yield
+                for step in steps[masks[current]]:
+                    neighbor = current + step
+                    if labels[neighbor] == -1:
+                        labels[neighbor] = label
+                        stack.append(neighbor)
+            sizes.append(size)
+        self.labels = labels
+        self.sizes = sizes
+        self.parent = list(range(len(sizes)))
+        self.version = version
+
+    def find(self, label):
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]] # path halving
+            label = parent[label]
+        return label
+
+    # called by grid.set_barrier after the cell and the masks changed
+    def cell_changed(self, index):
+        grid = self.grid
+        if self.version != grid.version - 1: # already out of date, leave it for the relabel
+            return
+        self.version = grid.version
+        labels = self.labels
+        if grid.cells[index] == FREE:
+            roots = {self.find(labels[index + step]) for step in grid.steps[grid.masks[index]]}
+            if not roots:
+                root = len(self.parent)
+                self.parent.append(root)
+                self.sizes.append(0)
+            else:
+                root = max(roots, key=self.sizes.__getitem__) # the small ones get hung under the biggest
+                for other in roots:
+                    if other != root:
+                        self.parent[other] = root
+                        self.sizes[root] += self.sizes[other]
+            labels[index] = root
+            self.sizes[root] += 1
+        else:
+            self.sizes[self.find(labels[index])] -= 1
+            labels[index] = -1
+            if self._might_split(index):
+                self.version = -1 # relabel on the next query
+
+    # a new barrier can only cut an area in two if its free neighbors don't stay connected
+    # around it, walking the 8 cells around it in a ring, consecutive ring cells are neighbors,
+    # so it's safe when all the free straight neighbors are in one unbroken free run of the ring
+    def _might_split(self, index):
+        grid = self.grid
+        row, col = grid.pos(index)
+        ring = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+        free = [grid.in_bounds(row + d_row, col + d_col) and not grid.is_barrier(row + d_row, col + d_col)
+                for d_row, d_col in ring]
+        runs = 0 # free runs that have a straight neighbor in them
+        for i in range(0, 8, 2): # the straight neighbors are the even ring slots
+            if free[i] and not (free[i - 1] and free[i - 2]):
+                runs += 1 # i starts a new run unless it's joined to the straight neighbor before it
+        if runs == 0 and all(free[i] for i in range(0, 8, 2)):
+            runs = 1 # the whole ring is free, one run with no start
+        return runs > 1
+
+    def connected(self, start, end):
+        if not self.current:
+            self.relabel()
+        labels = self.labels
+        if labels[start] == -1 or labels[end] == -1:
+            return False
+        return self.find(labels[start]) == self.find(labels[end])
+
+    # every label that's part of the biggest area (joins leave the old labels pointing at the new root),
+    # [] when there are no free cells, the cells of the area are the ones with one of these in labels
+    def largest_labels(self):
+        if not self.current:
+            self.relabel()
+        roots = [label for label in range(len(self.parent)) if self.parent[label] == label]
+        if not roots:
+            return []
+        root = max(roots, key=self.sizes.__getitem__)
+        if not self.sizes[root]:
+            return []
+        return [label for label in range(len(self.parent)) if self.find(label) == root]
+
+    # any free cell in the biggest area, -1 when there are no free cells
+    def largest(self):
+        for label in self.largest_labels():
+            try:
+                return self.labels.index(label)
+            except ValueError: # every cell with this label turned into a barrier
+                pass
+        return -1
+
+class Workspace:
+    STAMP_MAX = 0xFFFFFFFF
+
+    def __init__(self, size):
+        self.size = size
+        self.g_score = array("i" if 255 * size <= 0x7FFFFFFF else "q", [0]) * size
+        self.came_from = array("i", [-1]) * size
+        self.seen = array("I", [0]) * size # generation in which g_score/came_from were written
+        self.closed = array("I", [0]) * size # generation in which the cell was expanded
+        self.generation = 0
+
+    # start a new search, the stamps only get wiped when the counter wraps around
+    def next_generation(self):
+        if self.generation == self.STAMP_MAX:
+            self.seen = array("I", [0]) * self.size
+            self.closed = array("I", [0]) * self.size
+            self.generation = 0
+        self.generation += 1
+        return self.generation
+
+class SearchResult:
+    def __init__(self, path, expanded, peak_open=0, cost=None):
+        self.path = path # [] when there is no path
+        self.expanded = expanded # nodes taken off the open set
+        self.peak_open = peak_open # most entries the open set (heap or queue, stale ones too) ever held
+        self._cost = cost
+
+    @property
+    def cost(self): # sum of the weights stepped onto, the same as length without terrain
+        return self._cost if self._cost is not None and self.path else self.length
+
+    @property
+    def found(self):
+        return bool(self.path)
+
+    @property
+    def length(self): # number of steps, -1 when there is no path
+        return len(self.path) - 1
+
+    def __repr__(self):
+        return "SearchResult(found=%s, length=%d, cost=%d, expanded=%d, peak_open=%d)" % (
+            self.found, self.length, self.cost, self.expanded, self.peak_open)
+
+def manhattan(row1, col1, row2, col2):
+    return abs(row1 - row2) + abs(col1 - col2)
+
+def euclidean(row1, col1, row2, col2):
+    return math.hypot(row1 - row2, col1 - col2)
+
+HEURISTICS = {"manhattan": manhattan, "euclidean": euclidean}
+
+# a heuristic by name, "alt" is the landmark bound for this grid (see About landmarks)
+def get_heuristic(grid, heuristic):
+    if heuristic == "alt":
+        return grid.landmarks().bound
+    return HEURISTICS[heuristic]
+
+# for the searches that count steps, see About weights
+def _check_unweighted(grid, name):
+    if grid.weighted:
+        raise ValueError("%s counts every step as 1, use one of %s on a grid with weights" % (name, ", ".join(sorted(WEIGHTED))))
+
+def _check_endpoints(grid, start, end):
+    for name, p in (("start", start), ("end", end)):
+        if not grid.in_bounds(p[0], p[1]):
+            raise ValueError("%s %r is outside the %dx%d grid" % (name, p, grid.rows, grid.cols))
+        if grid.is_barrier(p[0], p[1]):
+            raise ValueError("%s %r is a barrier" % (name, p))
+    return grid.index(*start), grid.index(*end)
+
+# start and end are in different areas, only asked of labels that are already up to date (see About components)
+def _walled_off(grid, start_i, end_i):
+    components = grid._components
+    return components is not None and components.current and not components.connected(start_i, end_i)
+
+# walks the came_from links back from current, gives the path start -> current
+# came_from can be a dict or a Workspace array
+def reconstruct_path(grid, came_from, start, current):
+    path = [grid.pos(current)]
+    while current != start:
+        current = came_from[current]
+        path.append(grid.pos(current))
+    path.reverse()
+    return path
+
+# on_open(row, col) is called when a cell is pushed on the open set and
+# on_closed(row, col) when it has been expanded, the visualizer colors cells with them
+
+# runs a *_steps generator to the end and gives back its SearchResult
+def finish(steps, hooks=None):
+    began = time.perf_counter()
+    try:
+        while True:
+            next(steps)
+    except StopIteration as done:
+        if hooks is not None:
+            hooks.on_time(time.perf_counter() - began)
+        return done.value
+
+# does nothing, override the ones you want (see About hooks)
+class Hooks:
+    def on_push(self, index, open_size):
+        pass
+
+    def on_stale(self, index):
+        pass
+
+    def on_expand(self, index):
+        pass
+
+    def on_time(self, seconds):
+        pass
+
+# counts everything, one can be passed to several searches in a row and it adds them up
+# render_seconds isn't touched by the searches, it's for whoever draws them (the visualizer)
+class SearchStats(Hooks):
+    def __init__(self):
+        self.pushed = 0
+        self.stale = 0
+        self.expanded = 0
+        self.peak_open = 0
+        self.search_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def on_push(self, index, open_size):
+        self.pushed += 1
+        if open_size > self.peak_open:
+            self.peak_open = open_size
+
+    def on_stale(self, index):
+        self.stale += 1
+
+    def on_expand(self, index):
+        self.expanded += 1
+
+    def on_time(self, seconds):
+        self.search_seconds += seconds
+
+    @property
+    def seconds_per_expansion(self):
+        return self.search_seconds / self.expanded if self.expanded else 0.0
+
+    def __repr__(self):
+        return "SearchStats(expanded=%d, pushed=%d, stale=%d, peak_open=%d, search=%.3fs, render=%.3fs)" % (
+            self.expanded, self.pushed, self.stale, self.peak_open, self.search_seconds, self.render_seconds)
+
+# the open set is a plain heapq, an improved g score just pushes a new entry
+# and the old one gets skipped when it comes off the heap (the cell is closed by then)
+def astar_steps(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    h = get_heuristic(grid, heuristic)
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    end_row, end_col = end
+    cols = grid.cols
+    ws = grid.workspace()
+    generation = ws.next_generation()
+    g_score, came_from, seen, closed = ws.g_score, ws.came_from, ws.seen, ws.closed
+    heappush, heappop = heapq.heappush, heapq.heappop
+    steps, masks = grid.steps, grid.masks
+    weights = grid.weights
+
+    seen[start_i] = generation
+    g_score[start_i] = 0
+    start_h = h(start[0], start[1], end_row, end_col)
+    open_set = [(start_h, start_h, start_i)] # f score, h score (ties go to the cell closer to the end), data
+    expanded = peak_open = 0
+    if hooks is not None:
+        hooks.on_push(start_i, 1)
+
+    while open_set:
+        if len(open_set) > peak_open:
+            peak_open = len(open_set)
+        current = heappop(open_set)[2]
+        if closed[current] == generation: # stale entry
+            if hooks is not None:
+                hooks.on_stale(current)
+            continue
+        closed[current] = generation
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        if current == end_i:
+            return SearchResult(reconstruct_path(grid, came_from, start_i, current), expanded, peak_open, g_score[current])
+
+        g_current = g_score[current]
+        for step in steps[masks[current]]:
+            neighbor = current + step
+            temp_g_score = g_current + weights[neighbor] if weights is not None else g_current + 1
+            if seen[neighbor] != generation or temp_g_score < g_score[neighbor]:
+                seen[neighbor] = generation
+                g_score[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                row, col = divmod(neighbor, cols)
+                h_score = h(row, col, end_row, end_col)
+                heappush(open_set, (temp_g_score + h_score, h_score, neighbor))
+                if hooks is not None:
+                    hooks.on_push(neighbor, len(open_set))
+                if on_open is not None:
+                    on_open(row, col)
+
+        if on_closed is not None and current != start_i:
+            on_closed(*grid.pos(current))
+        yield
+
+    return SearchResult([], expanded, peak_open)
+
+# dijkstra's algorithm, the priority queue just stores the distance
+# same lazy deletion as astar: a cell can be on the heap more than once but only
+# its first pop (the shortest distance) gets expanded, the rest are skipped
+def dijkstra_steps(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    ws = grid.workspace()
+    generation = ws.next_generation()
+    g_score, came_from, seen, closed = ws.g_score, ws.came_from, ws.seen, ws.closed
+    heappush, heappop = heapq.heappush, heapq.heappop
+    steps, masks = grid.steps, grid.masks
+    weights = grid.weights
+
+    seen[start_i] = generation
+    g_score[start_i] = 0
+    open_set = [(0, start_i)] # distance, data (ties fall back to the cell index, no Spot.__lt__)
+    expanded = peak_open = 0
+    if hooks is not None:
+        hooks.on_push(start_i, 1)
+
+    while open_set:
+        if len(open_set) > peak_open:
+            peak_open = len(open_set)
+        current = heappop(open_set)[1]
+        if closed[current] == generation: # stale entry
+            if hooks is not None:
+                hooks.on_stale(current)
+            continue
+        closed[current] = generation
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        if current == end_i:
+            return SearchResult(reconstruct_path(grid, came_from, start_i, current), expanded, peak_open, g_score[current])
+
+        g_current = g_score[current]
+        for step in steps[masks[current]]:
+            neighbor = current + step
+            temp_g_score = g_current + weights[neighbor] if weights is not None else g_current + 1
+            if seen[neighbor] != generation or temp_g_score < g_score[neighbor]:
+                seen[neighbor] = generation
+                g_score[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                heappush(open_set, (temp_g_score, neighbor))
+                if hooks is not None:
+                    hooks.on_push(neighbor, len(open_set))
+                if on_open is not None:
+                    on_open(*grid.pos(neighbor))
+
+        if on_closed is not None and current != start_i:
+            on_closed(*grid.pos(current))
+        yield
+
+    return SearchResult([], expanded, peak_open)
+
+# dijkstra with a bucket queue (Dial's algorithm) instead of a heap, for small integer weights
+# every entry waiting to be expanded has a distance between the current one and current + max_weight,
+# so max_weight + 1 buckets used round robin (bucket d % size) hold all of them and
+# pushing and popping are O(1) list appends and pops instead of O(log n) heap operations
+# a bucket can still have stale entries (a cell that got a shorter distance later), same skip as dijkstra
+def dial_steps(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    ws = grid.workspace()
+    generation = ws.next_generation()
+    g_score, came_from, seen, closed = ws.g_score, ws.came_from, ws.seen, ws.closed
+    steps, masks = grid.steps, grid.masks
+    weights = grid.weights
+    size = grid.max_weight + 1
+
+    seen[start_i] = generation
+    g_score[start_i] = 0
+    buckets = [[] for _ in range(size)]
+    buckets[0].append(start_i)
+    waiting = 1 # entries in all the buckets
+    distance = 0
+    expanded = peak_open = 0
+    if hooks is not None:
+        hooks.on_push(start_i, 1)
+
+    while waiting:
+        bucket = buckets[distance % size]
+        if not bucket:
+            distance += 1
+            continue
+        if waiting > peak_open:
+            peak_open = waiting
+        current = bucket.pop()
+        waiting -= 1
+        if closed[current] == generation: # stale entry
+            if hooks is not None:
+                hooks.on_stale(current)
+            continue
+        closed[current] = generation
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        if current == end_i:
+            return SearchResult(reconstruct_path(grid, came_from, start_i, current), expanded, peak_open, distance)
+
+        for step in steps[masks[current]]:
+            neighbor = current + step
+            temp_g_score = distance + weights[neighbor] if weights is not None else distance + 1
+            if seen[neighbor] != generation or temp_g_score < g_score[neighbor]:
+                seen[neighbor] = generation
+                g_score[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                buckets[temp_g_score % size].append(neighbor)
+                waiting += 1
+                if hooks is not None:
+                    hooks.on_push(neighbor, waiting)
+                if on_open is not None:
+                    on_open(*grid.pos(neighbor))
+
+        if on_closed is not None and current != start_i:
+            on_closed(*grid.pos(current))
+        yield
+
+    return SearchResult([], expanded, peak_open)
+
+# breadth first search, every step costs 1 so the first time a cell is reached
+# is already the shortest distance, a plain fifo queue gives the same paths as dijkstra in O(V)
+def bfs_steps(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    _check_unweighted(grid, "bfs")
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    ws = grid.workspace()
+    generation = ws.next_generation()
+    came_from, seen = ws.came_from, ws.seen
+    steps, masks = grid.steps, grid.masks
+
+    seen[start_i] = generation
+    queue = deque([start_i])
+    expanded = peak_open = 0
+    if hooks is not None:
+        hooks.on_push(start_i, 1)
+
+    if start_i == end_i:
+        return SearchResult([grid.pos(start_i)], expanded, peak_open)
+
+    while queue:
+        if len(queue) > peak_open:
+            peak_open = len(queue)
+        current = queue.popleft()
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        for step in steps[masks[current]]:
+            neighbor = current + step
+            if seen[neighbor] != generation:
+                seen[neighbor] = generation
+                came_from[neighbor] = current
+                if neighbor == end_i:
+                    return SearchResult(reconstruct_path(grid, came_from, start_i, neighbor), expanded, peak_open)
+                queue.append(neighbor)
+                if hooks is not None:
+                    hooks.on_push(neighbor, len(queue))
+                if on_open is not None:
+                    on_open(*grid.pos(neighbor))
+
+        if on_closed is not None and current != start_i:
+            on_closed(*grid.pos(current))
+        yield
+
+    return SearchResult([], expanded, peak_open)
+
+# About jump point search
+# on a uniform-cost grid lots of paths have the same length (right then down = down then right)
+# and A* ends up expanding all of them, JPS only puts "jump points" on the open set:
+# it slides in a straight line until something interesting happens and skips the cells in between
+# this is the 4-connected version: a horizontal slide stops where a wall above/below it ends
+# (a forced neighbor), a vertical slide stops there too or where a horizontal slide from it would stop
+# the g scores are still exact so the path lengths come out the same as astar's
+
+# About the jump tables
+# a vertical slide looks left and right at every cell it passes, walking those rows cell by cell made one
+# slide cost up to rows x cols, so grid.jump_tables() keeps, for every cell, whether a slide to the right
+# stops there (stops_right: a forced neighbor, or no free cell to the right) and whether that stop is a
+# jump point (forced_right), the same going left, and a horizontal slide is one bytes find (rfind going left)
+# they only depend on the cells in the same row, so they're built a block of rows at a time with the same
+# big integer shifts as rebuild_masks, and again after the barriers change (grid.version)
+# vertical slides still walk cell by cell and yield every YIELD_EVERY cells so jps_steps stays on budget
+
+_HORIZONTAL = LEFT | RIGHT
+
+class JumpTables:
+    BLOCK = 1 << 16 # about how many cells are built between yields
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.version = grid.version
+        size = len(grid)
+        self.stops_right = bytearray(size)
+        self.forced_right = bytearray(size)
+        self.stops_left = bytearray(size)
+        self.forced_left = bytearray(size)
+
+    def build_steps(self):
+        grid = self.grid
+        cols = grid.cols
+        rows_per_block = max(1, self.BLOCK // cols)
+        patterns = {} # block rows -> (ones, not_first_col, not_last_col), every block but the last has the same
+        for first_row in range(0, grid.rows, rows_per_block):
+            rows = min(rows_per_block, grid.rows - first_row)
+            low, size = first_row * cols, rows * cols
+            if rows not in patterns:
+                patterns[rows] = (
+                    int.from_bytes(b"\x01" * size, "little"),
+                    int.from_bytes((b"\x00" + b"\x01" * (cols - 1)) * rows, "little"),
+                    int.from_bytes((b"\x01" * (cols - 1) + b"\x00") * rows, "little"),
+                )
+            ones, not_first_col, not_last_col = patterns[rows]
+            masks = int.from_bytes(grid.masks[low:low + size], "little")
+            down = masks & ones
+            up = (masks >> 1) & ones
+            right = (masks >> 2) & ones
+            left = (masks >> 3) & ones
+            # going right the cell behind is the one to the left (one byte lower), going left the one to the right
+            forced_right = ((up & ~(up << 8)) | (down & ~(down << 8))) & not_first_col
+            forced_left = ((up & ~(up >> 8)) | (down & ~(down >> 8))) & not_last_col
+            self.forced_right[low:low + size] = forced_right.to_bytes(size, "little")
+            self.stops_right[low:low + size] = (forced_right | (right ^ ones)).to_bytes(size, "little")
+            self.forced_left[low:low + size] = forced_left.to_bytes(size, "little")
+            self.stops_left[low:low + size] = (forced_left | (left ^ ones)).to_bytes(size, "little")
+            yield
+
+    # the horizontal slide from index (already free) in direction bit, the jump point it stops at or -1
+    # the last cell of a row never has RIGHT (the first never LEFT) so the stop is always in index's row
+    def slide(self, index, bit, end_i):
+        if bit == RIGHT:
+            stop = self.stops_right.find(1, index)
+            if index <= end_i <= stop:
+                return end_i
+            return stop if self.forced_right[stop] else -1
+        stop = self.stops_left.rfind(1, index - index % self.grid.cols, index + 1)
+        if stop <= end_i <= index:
+            return end_i
+        return stop if self.forced_left[stop] else -1
+
+# slides from index (already free) in direction bit, gives the jump point it stops at or -1
+def _jump(grid, tables, index, bit, end_i):
+    if bit & _HORIZONTAL:
+        return tables.slide(index, bit, end_i)
+    masks = grid.masks
+    step = grid.steps[bit][0]
+    slide = tables.slide
+    scanned = 0
+    while True:
+        if index == end_i:
+            return index
+        mask = masks[index]
+        behind = masks[index - step]
+        if (mask & LEFT and not behind & LEFT) or (mask & RIGHT and not behind & RIGHT):
+            return index
+        if (mask & RIGHT and slide(index + 1, RIGHT, end_i) != -1) or \
+           (mask & LEFT and slide(index - 1, LEFT, end_i) != -1):
+            return index
+        if not mask & bit:
+            return -1
+        index += step
+        scanned += 1
+        if scanned == YIELD_EVERY:
+            scanned = 0
+            yield
+
+# the direction bits worth trying from a jump point, depends on the way we got there
+def _jps_directions(grid, parent, current):
+    if parent == -1:
+        return (DOWN, UP, RIGHT, LEFT)
+    cols = grid.cols
+    if parent // cols == current // cols:
+        return (RIGHT if current > parent else LEFT, UP, DOWN)
+    return (DOWN if current > parent else UP, LEFT, RIGHT)
+
+# jump points are joined by straight lines, fills in the cells in between
+def _fill_segments(points):
+    path = [points[0]]
+    for row, col in points[1:]:
+        last_row, last_col = path[-1]
+        d_row = (row > last_row) - (row < last_row)
+        d_col = (col > last_col) - (col < last_col)
+        while (last_row, last_col) != (row, col):
+            last_row += d_row
+            last_col += d_col
+            path.append((last_row, last_col))
+    return path
+
+# expanded counts jump points taken off the open set, the cells slid over aren't counted
+def jps_steps(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    _check_unweighted(grid, "jps")
+    h = get_heuristic(grid, heuristic)
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    end_row, end_col = end
+    cols = grid.cols
+    ws = grid.workspace()
+    generation = ws.next_generation()
+    g_score, came_from, seen, closed = ws.g_score, ws.came_from, ws.seen, ws.closed
+    heappush, heappop = heapq.heappush, heapq.heappop
+    masks = grid.masks
+    tables = yield from grid.jump_tables_steps()
+
+    seen[start_i] = generation
+    g_score[start_i] = 0
+    came_from[start_i] = -1
+    start_h = h(start[0], start[1], end_row, end_col)
+    open_set = [(start_h, start_h, start_i)]
+    expanded = peak_open = 0
+    if hooks is not None:
+        hooks.on_push(start_i, 1)
+
+    while open_set:
+        if len(open_set) > peak_open:
+            peak_open = len(open_set)
+        current = heappop(open_set)[2]
+        if closed[current] == generation: # stale entry
+            if hooks is not None:
+                hooks.on_stale(current)
+            continue
+        closed[current] = generation
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        if current == end_i:
+            points = reconstruct_path(grid, came_from, start_i, current)
+            return SearchResult(_fill_segments(points), expanded, peak_open)
+
+        row, col = divmod(current, cols)
+        for bit in _jps_directions(grid, came_from[current], current):
+            if not masks[current] & bit:
+                continue
+            jump_point = yield from _jump(grid, tables, current + grid.steps[bit][0], bit, end_i)
+            if jump_point == -1:
+                continue
+            jump_row, jump_col = divmod(jump_point, cols)
+            temp_g_score = g_score[current] + abs(jump_row - row) + abs(jump_col - col)
+            if seen[jump_point] != generation or temp_g_score < g_score[jump_point]:
+                seen[jump_point] = generation
+                g_score[jump_point] = temp_g_score
+                came_from[jump_point] = current
+                h_score = h(jump_row, jump_col, end_row, end_col)
+                heappush(open_set, (temp_g_score + h_score, h_score, jump_point))
+                if hooks is not None:
+                    hooks.on_push(jump_point, len(open_set))
+                if on_open is not None:
+                    on_open(jump_row, jump_col)
+
+        if on_closed is not None and current != start_i:
+            on_closed(row, col)
+        yield
+
+    return SearchResult([], expanded, peak_open)
+
+# About the bidirectional searches
+# one search goes out from start and one from end (slots 0 and 1 of the workspace), always
+# growing the side with the smaller open set, every edge that reaches a cell the other side
+# has already seen is a complete path and the shortest one so far is kept (best)
+# dijkstra can stop once the two smallest distances on the heaps add up to best,
+# A* once either side's smallest f score reaches it (nothing left on that side can beat it)
+# the path is stitched together from both came_from arrays at the meeting edge
+
+def _bidirectional_steps(grid, start, end, h, on_open, on_closed, hooks):
+    _check_unweighted(grid, "the bidirectional searches")
+    start_i, end_i = _check_endpoints(grid, start, end)
+    if _walled_off(grid, start_i, end_i):
+        return SearchResult([], 0, 0)
+    if start_i == end_i:
+        return SearchResult([grid.pos(start_i)], 0)
+    cols = grid.cols
+    heappush, heappop = heapq.heappush, heapq.heappop
+    steps, masks = grid.steps, grid.masks
+
+    sides = []
+    for slot, origin, target in ((0, start_i, end), (1, end_i, start)):
+        ws = grid.workspace(slot)
+        generation = ws.next_generation()
+        ws.seen[origin] = generation
+        ws.g_score[origin] = 0
+        origin_h = h(*grid.pos(origin), *target) if h else 0
+        sides.append((ws, generation, target, [(origin_h, origin_h, origin)]))
+        if hooks is not None:
+            hooks.on_push(origin, slot + 1)
+    forward, backward = sides
+
+    best = math.inf
+    meet = None # (cell on the start side, cell on the end side)
+    expanded = peak_open = 0
+
+    while True:
+        for ws, generation, target, open_set in sides:
+            while open_set and ws.closed[open_set[0][2]] == generation: # stale entries
+                stale = heappop(open_set)[2]
+                if hooks is not None:
+                    hooks.on_stale(stale)
+        if not forward[3] or not backward[3]:
+            break
+        if len(forward[3]) + len(backward[3]) > peak_open:
+            peak_open = len(forward[3]) + len(backward[3])
+        top_forward, top_backward = forward[3][0][0], backward[3][0][0]
+        if h is None and top_forward + top_backward >= best:
+            break
+        if h is not None and max(top_forward, top_backward) >= best:
+            break
+
+        if len(forward[3]) <= len(backward[3]):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        ws, generation, (target_row, target_col), open_set = side
+        g_score, came_from, seen = ws.g_score, ws.came_from, ws.seen
+        other_g_score, other_seen, other_generation = other[0].g_score, other[0].seen, other[1]
+
+        current = heappop(open_set)[2]
+        ws.closed[current] = generation
+        expanded += 1
+        if hooks is not None:
+            hooks.on_expand(current)
+
+        temp_g_score = g_score[current] + 1
+        for step in steps[masks[current]]:
+            neighbor = current + step
+            if other_seen[neighbor] == other_generation and temp_g_score + other_g_score[neighbor] < best:
+                best = temp_g_score + other_g_score[neighbor]
+                meet = (current, neighbor) if side is forward else (neighbor, current)
+            if seen[neighbor] != generation or temp_g_score < g_score[neighbor]:
+                seen[neighbor] = generation
+                g_score[neighbor] = temp_g_score
+                came_from[neighbor] = current
+                row, col = divmod(neighbor, cols)
+                h_score = h(row, col, target_row, target_col) if h else 0
+                heappush(open_set, (temp_g_score + h_score, h_score, neighbor))
+                if hooks is not None:
+                    hooks.on_push(neighbor, len(forward[3]) + len(backward[3]))
+                if on_open is not None:
+                    on_open(row, col)
+
+        if on_closed is not None and current != start_i and current != end_i:
+            on_closed(*grid.pos(current))
+        yield
+
+    if meet is None:
+        return SearchResult([], expanded, peak_open)
+    path = reconstruct_path(grid, forward[0].came_from, start_i, meet[0])
+    path += reversed(reconstruct_path(grid, backward[0].came_from, end_i, meet[1]))
+    return SearchResult(path, expanded, peak_open)
+
+def bidirectional_astar_steps(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    return _bidirectional_steps(grid, start, end, get_heuristic(grid, heuristic), on_open, on_closed, hooks)
+
+def bidirectional_dijkstra_steps(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    return _bidirectional_steps(grid, start, end, None, on_open, on_closed, hooks)
+
+def astar(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    return finish(astar_steps(grid, start, end, heuristic, on_open, on_closed, hooks), hooks)
+
+def dijkstra(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    return finish(dijkstra_steps(grid, start, end, on_open, on_closed, hooks), hooks)
+
+def dial(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    return finish(dial_steps(grid, start, end, on_open, on_closed, hooks), hooks)
+
+def bfs(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    return finish(bfs_steps(grid, start, end, on_open, on_closed, hooks), hooks)
+
+def jps(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    return finish(jps_steps(grid, start, end, heuristic, on_open, on_closed, hooks), hooks)
+
+def bidirectional_astar(grid, start, end, heuristic="manhattan", on_open=None, on_closed=None, hooks=None):
+    return finish(bidirectional_astar_steps(grid, start, end, heuristic, on_open, on_closed, hooks), hooks)
+
+def bidirectional_dijkstra(grid, start, end, on_open=None, on_closed=None, hooks=None):
+    return finish(bidirectional_dijkstra_steps(grid, start, end, on_open, on_closed, hooks), hooks)
+
+# every search by name, for the benchmark and anything else that picks one from a string
+ALGORITHMS = {
+    "astar": astar,
+    "dijkstra": dijkstra,
+    "dial": dial,
+    "bfs": bfs,
+    "jps": jps,
+    "bidirectional_astar": bidirectional_astar,
+    "bidirectional_dijkstra": bidirectional_dijkstra,
+}
+
+# the same searches as generators, see About stepping
+STEPS = {
+    "astar": astar_steps,
+    "dijkstra": dijkstra_steps,
+    "dial": dial_steps,
+    "bfs": bfs_steps,
+    "jps": jps_steps,
+    "bidirectional_astar": bidirectional_astar_steps,
+    "bidirectional_dijkstra": bidirectional_dijkstra_steps,
+}
+
+# the ones that add up terrain weights, see About weights
+WEIGHTED = {"astar", "dijkstra", "dial"}
+
+# see About the self check, gives back how many flips were checked without a relabel
+def check_components(grids=300, flips=200, seed=1):
+    rng = random.Random(seed)
+    kept = 0
+    for number in range(grids):
+        rows, cols = rng.randint(1, 12), rng.randint(1, 12)
+        density = rng.choice((0.2, 0.4, 0.6))
+        grid = Grid(rows, cols)
+        for index in range(len(grid)):
+            grid.cells[index] = BARRIER if rng.random() < density else FREE
+        grid.rebuild_masks()
+        components = grid.components()
+        for flip in range(flips):
+            row, col = rng.randrange(rows), rng.randrange(cols)
+            grid.set_barrier(row, col, not grid.is_barrier(row, col))
+            if not components.current: # might have split an area, nothing incremental to check
+                components.relabel()
+                continue
+            kept += 1
+            fresh = Components(grid)
+            fresh.relabel()
+            pairs = {} # kept root -> fresh label, has to be one to one
+            for index, label in enumerate(components.labels):
+                where = "grid %d flip %d cell %s" % (number, flip, grid.pos(index))
+                assert (label == -1) == (fresh.labels[index] == -1), where
+                if label != -1:
+                    root = components.find(label)
+                    assert pairs.setdefault(root, fresh.labels[index]) == fresh.labels[index], where
+                    assert components.sizes[root] == fresh.sizes[fresh.labels[index]], where
+            assert len(set(pairs.values())) == len(pairs) == len(fresh.sizes), "grid %d flip %d" % (number, flip)
+    return kept
+
+if __name__ == "__main__":
+    kept = check_components(seed=int(sys.argv[1]) if len(sys.argv) > 1 else 1)
+    print("components: %d incremental updates matched a fresh labeling" % kept)
@@ -1,4 +1,4 @@
-# i consider all the nodes to have weight of 1
+# i consider all the nodes to have weight of 1, unless you paint terrain on them (keys 2-9), then stepping on one costs its weight
 # the goal of this algorithm is to find the shortest path
 
 # About the algorithms 
@@ -14,16 +14,37 @@ print("Instructions:")
 print("right click: to place start, end, and barriers")
 print("left click: remove")
 print("r: generate a random maze")
+print("p: generate a perfect maze (recursive backtracker), u: the same with randomized Kruskal")
 print("m: A* path finding algorithm w/Manhattan distance")
 print("e: A* path finding algorithm w/Euclidean distance")
-print("d: Dijkstra's algorithm/BFS")
+print("d: Dijkstra's algorithm")
+print("q: Dijkstra's algorithm with a bucket queue (Dial's), faster when the weights are small")
+print("b: breadth first search")
+print("j: jump point search")
+print("h: A* w/landmark (ALT) distances, knows about the barriers so it goes around walls without looking everywhere")
+print("   (the first h after the barriers change builds the landmark tables first, that can take a while on big grids)")
+print("a: bidirectional A* w/Manhattan distance")
+print("k: bidirectional Dijkstra's algorithm")
+print("l: LPA*, barriers placed or removed afterwards replan right away and only repair what changed")
+print("2-9: paint terrain that costs that much to step on instead of barriers, 1 or 0: back to barriers")
+print("     (only A*, Dijkstra, Dial's and LPA* use terrain, the others count every step as 1)")
+print("esc: stop the search that's running")
 print("c: clear all")
 print("s: soft reset")
+print("i: show or hide the numbers for the last search (expanded, pushed, stale pops, search vs draw time)")
+print("w: save the barriers, start and end to scenario.pgs, o: open it again")
+print("arrow keys: scroll, mouse wheel or +/-: zoom")
+print("usage: python pathfinding.py [rows [cols]], the grid is 50x50 by default")
 
+import sys
+import time
 import pygame
-import math 
+import numpy as np
 import random
-from queue import PriorityQueue
+import mazes
+import pathengine
+import replan
+import scenario
 
 WIDTH = 600
 WIN = pygame.display.set_mode((WIDTH, WIDTH))
@@ -40,307 +61,735 @@ ORANGE = (255, 165 ,0)
 GREY = (128, 128, 128)
 TURQUOISE = (64, 224, 208)
 
+# what a cell can be, Board.state stores one of these per cell and COLORS[state] is how it looks
+EMPTY = 0
+BARRIER = 1
+START = 2
+END = 3
+OPEN = 4
+CLOSED = 5
+PATH = 6
+COLORS = [WHITE, BLACK, ORANGE, TURQUOISE, GREEN, RED, PURPLE]
+
+# empty cells with terrain, TERRAIN + weight - 2 for weights 2 to 9, lighter is cheaper, addition #15
+TERRAIN = len(COLORS)
+MAX_TERRAIN = 9
+COLORS += [(235 - 15 * weight, 215 - 20 * weight, 170 - 18 * weight) for weight in range(2, MAX_TERRAIN + 1)]
+
+# big grids, addition #8
+# there's no python object per cell anymore, the whole grid is two flat bytearrays:
+# Board.state (which of the states above every cell is in) and Board.engine, the pathengine grid
+# that holds the barriers, both indexed by row * cols + col
+# a Spot is only a tiny view (board, row, col) made when needed, two spots are equal if they
+# point at the same cell
+class Board:
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.state = bytearray(rows * cols)
+        self.engine = pathengine.Grid(rows, cols)
+        self.dirty = set() # cell indices the renderer still has to redraw
+        self.stale = True # the renderer has to redraw everything
+
+    def spot(self, row, col):
+        return Spot(self, row, col)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    # the engine's barriers always follow the state, so searches can start right away
+    # an empty cell with terrain gets its terrain color instead
+    def set_state(self, index, state):
+        if state == EMPTY and self.engine.weights is not None and self.engine.weights[index] > 1:
+            state = TERRAIN + min(self.engine.weights[index], MAX_TERRAIN) - 2
+        old = self.state[index]
+        if old == state:
+            return
+        if (old == BARRIER) != (state == BARRIER):
+            self.engine.set_barrier(*divmod(index, self.cols), state == BARRIER)
+        self.state[index] = state
+        self.dirty.add(index)
+
+    # after mazes.py wrote the engine's cells directly the state follows them (barrier and empty
+    # are 1 and 0 in both), anything else on the board is gone so only use it on a fresh board
+    def sync(self):
+        self.state[:] = self.engine.cells
+        self.show_terrain()
+        self.dirty.clear()
+        self.stale = True
+
+    # empty cells that have a weight get their terrain color back, all at once with numpy
+    def show_terrain(self):
+        if self.engine.weights is None:
+            return
+        state = np.frombuffer(self.state, dtype=np.uint8)
+        weights = np.frombuffer(self.engine.weights, dtype=np.uint8)
+        heavy = (state == EMPTY) & (weights > 1)
+        state[heavy] = TERRAIN + np.minimum(weights[heavy], MAX_TERRAIN) - 2
+        self.stale = True
+
+    # paints terrain, barriers, start and end keep their color until they're removed
+    def set_weight(self, index, weight):
+        self.engine.set_weight(*divmod(index, self.cols), weight)
+        if self.state[index] == EMPTY or self.state[index] >= TERRAIN:
+            self.set_state(index, EMPTY)
+
 class Spot:
-    def __init__(self, row, col, width, total_rows):
+    __slots__ = ("board", "row", "col", "index")
+
+    def __init__(self, board, row, col):
+        self.board = board
         self.row = row
         self.col = col
-        self.x = row * width
-        self.y = col * width
-        self.color = WHITE
-        self.neighbors = []
-        self.width = width
-        self.total_rows = total_rows
+        self.index = row * board.cols + col
+
+    def __eq__(self, other):
+        return isinstance(other, Spot) and self.board is other.board and self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
+    @property
+    def color(self):
+        return COLORS[self.board.state[self.index]]
 
     def get_pos(self):
         return self.row, self.col
     
     def is_closed(self):
-        return self.color == RED 
+        return self.board.state[self.index] == CLOSED
     
     def is_open(self):
-        return self.color == GREEN
+        return self.board.state[self.index] == OPEN
 
     def is_barrier(self):
-        return self.color == BLACK
+        return self.board.state[self.index] == BARRIER
     
     def is_start(self):
-        return self.color == ORANGE
+        return self.board.state[self.index] == START
     
     def is_end(self):
-        return self.color == TURQUOISE
+        return self.board.state[self.index] == END
+
+    def weight(self):
+        return self.board.engine.weight(self.row, self.col)
     
     def reset(self):
-        self.color = WHITE
+        self.board.set_state(self.index, EMPTY)
 
     def make_closed(self):
-        self.color = RED 
+        self.board.set_state(self.index, CLOSED)
     
     def make_open(self):
-        self.color = GREEN
+        self.board.set_state(self.index, OPEN)
 
     def make_barrier(self):
-        self.color = BLACK
+        self.board.set_state(self.index, BARRIER)
     
     def make_start(self):
-        self.color = ORANGE
+        self.board.set_state(self.index, START)
     
     def make_end(self):
-        self.color = TURQUOISE
+        self.board.set_state(self.index, END)
     
     def make_path(self):
-        self.color = PURPLE
-
-    def draw(self, win):
-        pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.width))
-
-    def update_neighbors(self,grid):
-        if self.row < self.total_rows - 1 and not grid[self.row + 1][self.col].is_barrier(): # down neighbor
-            self.neighbors.append(grid[self.row + 1][self.col])
-        if self.row > 0 and not grid[self.row - 1][self.col].is_barrier(): # up neighbor
-            self.neighbors.append(grid[self.row - 1][self.col])
-        if self.col < self.total_rows - 1 and not grid[self.row][self.col + 1].is_barrier(): # right neighbor
-            self.neighbors.append(grid[self.row][self.col + 1])
-        if self.row > 0 and not grid[self.row][self.col - 1].is_barrier(): # left neighbor
-            self.neighbors.append(grid[self.row][self.col - 1])
-
-    def __lt__(self, other): # for priority queue, doesn't rly matter too much
-        return False
-    
-def h(p1, p2): #heuristic function
-    # Adding euclidean distance to heuristic function, #addition 5
-    if euclidean == 1:
-        return math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-    x1, y1 = p1
-    x2, y2 = p2
-    return abs(x1 - x2) + abs(y1 - y2)
-
-def reconstruct_path(came_from, current, draw):
-    while current in came_from:
-        current = came_from[current]
-        current.make_path()
-        draw()
-    current.make_start()
-
-def astar(draw, grid, start, end):
-    count = 0
-    open_set = PriorityQueue()
-    open_set.put((0, count, start)) # priority, tiebreaker, data
-    came_from = {} # for reconstructing path
-    g_score = {spot: float("inf") for row in grid for spot in row}
-    g_score[start] = 0
-    f_score = {spot: float("inf") for row in grid for spot in row}
-    f_score[start] = h(start.get_pos(), end.get_pos())
-
-    open_set_hash = {start}
-
-    while not open_set.empty():
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-        current = open_set.get()[2]
-        open_set_hash.remove(current)
-
-        if current == end:
-            reconstruct_path(came_from, end, draw)
-            end.make_end()
+        self.board.set_state(self.index, PATH)
+
+# the searching itself is done by pathengine, this is just a thin client:
+# the board keeps the engine grid's barriers up to date, the searches
+# color the cells the engine reports and then draw the path
+def reconstruct_path(path, grid):
+    for row, col in path[1:-1]:
+        grid.spot(row, col).make_path()
+
+# the window title shows how the last search did so the algorithms can be compared
+def show_result(name, result):
+    if result.found and result.cost != result.length:
+        pygame.display.set_caption("%s: path length %d, cost %d, %d nodes expanded" % (
+            name, result.length, result.cost, result.expanded))
+    elif result.found:
+        pygame.display.set_caption("%s: path length %d, %d nodes expanded" % (name, result.length, result.expanded))
+    else:
+        pygame.display.set_caption("%s: no path, %d nodes expanded" % (name, result.expanded))
+
+# a search that runs a bit every frame, addition #10
+# it wraps one of the engine's *_steps generators and main calls advance() once a frame with
+# a time budget, so the window keeps handling events while it runs, the search goes as fast as
+# the budget allows instead of waiting on the screen, and cancelling it is just dropping it
+# prepare is a list of (generator, what it's doing) that run first on the same budget, for the
+# engine's tables that take a while to build (the component labels after the barriers changed)
+class Stepper:
+    CHECK_EVERY = 32 # expansions between looks at the clock
+
+    # stats is the pathengine.SearchStats the search was given as hooks, advance adds its time to it
+    def __init__(self, name, grid, steps, stats, prepare=()):
+        self.name = name
+        self.grid = grid
+        self.steps = steps
+        self.stats = stats
+        self.prepare = list(prepare)
+        self.prepare_seconds = 0 # kept apart from stats, it's not the search
+        self.preparing = None # what the title says is being built
+
+    # runs the preparing generators until the deadline, True once they're all done
+    # the title only changes when one of them actually has something to build
+    def _prepare(self, deadline):
+        while self.prepare:
+            steps, what = self.prepare[0]
+            try:
+                while time.perf_counter() < deadline:
+                    next(steps)
+                    if self.preparing != what:
+                        self.preparing = what
+                        pygame.display.set_caption("%s: %s" % (self.name, what))
+                return False
+            except StopIteration:
+                self.prepare.pop(0)
+        if self.preparing is not None:
+            pygame.display.set_caption("%s: searching" % self.name)
+        return True
+
+    # runs for about budget_ms, returns True once the search is done and its path is drawn
+    def advance(self, budget_ms):
+        began = time.perf_counter()
+        deadline = began + budget_ms / 1000
+        if self.prepare:
+            ready = self._prepare(deadline)
+            self.prepare_seconds += time.perf_counter() - began
+            if not ready:
+                return False
+            began = time.perf_counter()
+        steps = self.steps
+        try:
+            while time.perf_counter() < deadline:
+                for _ in range(self.CHECK_EVERY):
+                    next(steps)
+        except StopIteration as done:
+            reconstruct_path(done.value.path, self.grid)
+            show_result(self.name, done.value)
             return True
+        finally:
+            self.stats.on_time(time.perf_counter() - began)
+        return False
 
-        for neighbor in current.neighbors:
-            temp_g_score = g_score[current] + 1
-
-            if temp_g_score < g_score[neighbor]:
-                came_from[neighbor] = current
-                g_score[neighbor] = temp_g_score
-                f_score[neighbor] = temp_g_score + h(neighbor.get_pos(), end.get_pos())
-                if neighbor not in open_set_hash:
-                    count += 1
-                    open_set.put((f_score[neighbor], count, neighbor))
-                    open_set_hash.add(neighbor)
-                    neighbor.make_open()
-
-        draw()
-
-        if current != start:
-            current.make_closed()
-
-    return False
+    # the lines for the renderer's overlay
+    def report(self):
+        stats = self.stats
+        return [
+            self.name,
+            "expanded %d   pushed %d   stale pops %d" % (stats.expanded, stats.pushed, stats.stale),
+            "peak open set %d" % stats.peak_open,
+            "search %.1f ms   %.1f us per expansion" % (stats.search_seconds * 1000, stats.seconds_per_expansion * 1e6),
+            "drawing %.1f ms   preparing %.1f ms" % (stats.render_seconds * 1000, self.prepare_seconds * 1000),
+        ]
+
+    def cancel(self):
+        for steps, _ in self.prepare:
+            steps.close()
+        self.steps.close()
+        pygame.display.set_caption("%s: stopped" % self.name)
+
+def visualize(search_steps, name, grid, start, end, **options):
+    if grid.engine.weighted and search_steps.__name__[:-len("_steps")] not in pathengine.WEIGHTED:
+        pygame.display.set_caption("%s counts every step as 1, clear the terrain or use A*, Dijkstra or Dial's" % name)
+        return None
+    cols = grid.cols
+    end_index = end.index
+
+    def on_open(row, col):
+        index = row * cols + col
+        if index != end_index:
+            grid.set_state(index, OPEN)
+
+    def on_closed(row, col):
+        grid.set_state(row * cols + col, CLOSED)
+
+    stats = pathengine.SearchStats()
+    steps = search_steps(grid.engine, start.get_pos(), end.get_pos(),
+                         on_open=on_open, on_closed=on_closed, hooks=stats, **options)
+    # the searches only use component labels that are up to date, fixing them is a flood fill so it gets frames of its own
+    prepare = [(grid.engine.components_steps(), "labeling the open areas")]
+    if options.get("heuristic") == "alt": # same for the landmark tables, astar_steps would build them in one go
+        prepare.append((grid.engine.landmarks_steps(), "building the landmark tables (once after every edit)"))
+    return Stepper(name, grid, steps, stats, prepare)
+
+def astar(grid, start, end):
+    heuristic = "euclidean" if euclidean == 1 else "manhattan"
+    return visualize(pathengine.astar_steps, "A* (%s)" % heuristic, grid, start, end, heuristic=heuristic)
+
+# A* with the landmark heuristic, addition #11
+# the landmark tables get built on the first search and again after the barriers change,
+# that's a preprocessing step before the search starts (the title says so while it runs)
+def astar_alt(grid, start, end):
+    return visualize(pathengine.astar_steps, "A* (landmarks)", grid, start, end, heuristic="alt")
 
 # dijkstra's algorithm, addition #4
-def dijkstra(draw, grid, start, end):
-    open_set = PriorityQueue()
-    open_set.put((0, start)) 
-    came_from = {} 
-    f_score = {spot: float("inf") for row in grid for spot in row}
-    f_score[start] = 0
-
-    while not open_set.empty():
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-        
-        current = open_set.get()[1]
-        if current == end:
-            reconstruct_path(came_from, end, draw)
-            end.make_end()
-            return True
-
-        for neighbor in current.neighbors:
-            temp_f_score = f_score[current] + 1
-            if temp_f_score < f_score[neighbor]:
-                came_from[neighbor] = current
-                f_score[neighbor] = temp_f_score
-                open_set.put((f_score[neighbor], neighbor))
-                neighbor.make_open()
-                
-
-        draw()
-
-        if current != start:
-            current.make_closed()
-
-    return False
-
-def make_grid(rows, width):
-    grid = []
-    gap = width // rows
-    for i in range(rows):
-        grid.append([])
-        for j in range(rows):
-            spot = Spot(i, j, gap, rows)
-            grid[i].append(spot)
-    return grid
-
-def draw_grid(win, rows, width):
-    gap = width // rows
-    for i in range(rows):
-        pygame.draw.line(win, GREY, (0, i * gap), (width, i * gap))
-        pygame.draw.line(win, GREY, (i * gap, 0), (i * gap, width))
-
-def draw(win, grid, rows, width):
-    win.fill(WHITE)
-
-    for row in grid:
-        for spot in row:
-            spot.draw(win)
-    
-    draw_grid(win, rows, width)
-    pygame.display.update()
-
-def get_clicked_pos(pos, rows, width):
-    gap = width // rows
-    y, x = pos
-
-    row = y // gap
-    col = x // gap
-
-    return row, col
+def dijkstra(grid, start, end):
+    return visualize(pathengine.dijkstra_steps, "Dijkstra", grid, start, end)
+
+# same paths as dijkstra, addition #15
+def dial(grid, start, end):
+    return visualize(pathengine.dial_steps, "Dial's algorithm", grid, start, end)
+
+def bfs(grid, start, end):
+    return visualize(pathengine.bfs_steps, "BFS", grid, start, end)
+
+# only the jump points get colored, the cells it slides over stay white
+def jps(grid, start, end):
+    return visualize(pathengine.jps_steps, "Jump point search", grid, start, end)
+
+# searches from both ends at once, both frontiers get colored the same
+def bidirectional_astar(grid, start, end):
+    return visualize(pathengine.bidirectional_astar_steps, "Bidirectional A*", grid, start, end)
+
+def bidirectional_dijkstra(grid, start, end):
+    return visualize(pathengine.bidirectional_dijkstra_steps, "Bidirectional Dijkstra", grid, start, end)
+
+# LPA*, addition #9
+# the planner lives on between keypresses, main tells it about every barrier that changes
+# and this shows only the cells it had to look at again to fix the path
+# stopping it halfway is fine, the next compute carries on where it left off
+def lpastar(grid, planner):
+    cols = grid.cols
+
+    def on_closed(row, col):
+        grid.set_state(row * cols + col, CLOSED)
+
+    soft_reset(None, grid)
+    planner.hooks = pathengine.SearchStats() # fresh numbers for every replan
+    return Stepper("LPA*", grid, planner.compute_steps(on_closed=on_closed), planner.hooks)
+
+def make_grid(rows, cols):
+    return Board(rows, cols)
+
+# grid lines every gap pixels, rows run left to right and cols top to bottom like before
+def draw_grid(win, gap, width):
+    for i in range(0, width, gap):
+        pygame.draw.line(win, GREY, (0, i), (width, i))
+        pygame.draw.line(win, GREY, (i, 0), (i, width))
+
+# redraws only the cells that changed since the last frame, addition #7
+# and only the part of the board that's in view, addition #8
+# the whole board is also kept as a picture with one 8-bit pixel per cell (the palette is COLORS),
+# changed cells are poked into it and a full redraw just scales the visible piece up to the window,
+# so it doesn't matter how many cells are off screen
+# the grid lines for each zoom level are drawn once on a see-through surface and blitted back over changed cells,
+# and main only flushes once a frame (fps times a second) no matter how many cells a search touched in between
+class Renderer:
+    MIN_LINE_GAP = 4 # no grid lines when the cells are smaller than this
+    MAX_CELL = 64
+    MAX_DIRTY = 2000 # past this many changed cells a full redraw is cheaper
+
+    def __init__(self, win, grid, width, fps=60):
+        self.win = win
+        self.width = width
+        self.fps = fps
+        self.lines = {} # cell size -> grid line surface
+        self.overlay = None # lines of text drawn in the top left corner, None when it's hidden
+        self.overlay_rect = pygame.Rect(0, 0, 0, 0)
+        self.font = None
+        self.set_board(grid)
+
+    # a new board shows up, start zoomed so it fits (or at 1 pixel per cell if it doesn't)
+    def set_board(self, grid):
+        self.grid = grid
+        self.cell = max(1, min(self.MAX_CELL, self.width // max(grid.rows, grid.cols)))
+        self.first_row = 0
+        self.first_col = 0
+        self.picture = pygame.Surface((grid.rows, grid.cols), depth=8)
+        self.picture.set_palette(COLORS)
+        grid.stale = True
+
+    def visible(self): # how many rows and cols fit in the window
+        return -(-self.width // self.cell), -(-self.width // self.cell)
+
+    def cell_at(self, pos): # window pixel -> (row, col) or None if there's no cell there
+        x, y = pos
+        row = self.first_row + x // self.cell
+        col = self.first_col + y // self.cell
+        if not self.grid.in_bounds(row, col):
+            return None
+        return row, col
+
+    def scroll(self, d_rows, d_cols):
+        visible_rows, visible_cols = self.visible()
+        self.first_row = max(0, min(self.first_row + d_rows, self.grid.rows - visible_rows))
+        self.first_col = max(0, min(self.first_col + d_cols, self.grid.cols - visible_cols))
+        self.redraw()
+
+    # keeps the cell under pos where it is on screen
+    def zoom(self, factor, pos=None):
+        x, y = pos if pos is not None else (self.width // 2, self.width // 2)
+        row, col = self.first_row + x / self.cell, self.first_col + y / self.cell
+        self.cell = max(1, min(self.MAX_CELL, round(self.cell * factor) if factor > 1 else int(self.cell * factor)))
+        self.first_row = int(row - x / self.cell)
+        self.first_col = int(col - y / self.cell)
+        self.scroll(0, 0)
+
+    def grid_lines(self):
+        if self.cell < self.MIN_LINE_GAP:
+            return None
+        if self.cell not in self.lines:
+            lines = pygame.Surface((self.width, self.width), pygame.SRCALPHA)
+            draw_grid(lines, self.cell, self.width)
+            self.lines[self.cell] = lines
+        return self.lines[self.cell]
+
+    def redraw(self):
+        grid = self.grid
+        if grid.stale:
+            cells = np.frombuffer(grid.state, dtype=np.uint8).reshape(grid.rows, grid.cols)
+            pygame.surfarray.blit_array(self.picture, cells)
+            grid.stale = False
+        grid.dirty.clear()
+        visible_rows, visible_cols = self.visible()
+        rows = min(visible_rows, grid.rows - self.first_row)
+        cols = min(visible_cols, grid.cols - self.first_col)
+        piece = self.picture.subsurface((self.first_row, self.first_col, rows, cols))
+        self.win.fill(WHITE)
+        self.win.blit(pygame.transform.scale(piece, (rows * self.cell, cols * self.cell)), (0, 0))
+        lines = self.grid_lines()
+        if lines is not None:
+            self.win.blit(lines, (0, 0))
+        self.draw_overlay()
+        pygame.display.update()
+
+    # the box only ever grows so the old text is always covered, hiding it redraws everything
+    def draw_overlay(self):
+        if self.overlay is None:
+            return None
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont(None, 20)
+        texts = [self.font.render(line, True, BLACK) for line in self.overlay]
+        width = max(text.get_width() for text in texts) + 8
+        height = sum(text.get_height() for text in texts) + 8
+        self.overlay_rect.union_ip(pygame.Rect(0, 0, width, height))
+        self.win.fill(WHITE, self.overlay_rect)
+        pygame.draw.rect(self.win, GREY, self.overlay_rect, 1)
+        y = 4
+        for text in texts:
+            self.win.blit(text, (4, y))
+            y += text.get_height()
+        return self.overlay_rect
+
+    def show_overlay(self, lines):
+        if lines is None and self.overlay is not None:
+            self.overlay_rect = pygame.Rect(0, 0, 0, 0)
+            self.grid.stale = True
+        self.overlay = lines
+
+    def flush(self):
+        grid = self.grid
+        if grid.stale or len(grid.dirty) > self.MAX_DIRTY:
+            grid.stale = True
+            self.redraw()
+            return
+        if not grid.dirty:
+            if self.overlay is not None:
+                pygame.display.update(self.draw_overlay())
+            return
+        cell = self.cell
+        lines = self.grid_lines()
+        rects = []
+        for index in grid.dirty:
+            row, col = divmod(index, grid.cols)
+            color = COLORS[grid.state[index]]
+            self.picture.set_at((row, col), color)
+            x, y = (row - self.first_row) * cell, (col - self.first_col) * cell
+            if 0 <= x < self.width and 0 <= y < self.width:
+                rect = pygame.Rect(x, y, cell, cell)
+                self.win.fill(color, rect)
+                if lines is not None:
+                    self.win.blit(lines, rect, rect)
+                rects.append(rect)
+        grid.dirty.clear()
+        if self.overlay is not None:
+            rects.append(self.draw_overlay())
+        if rects:
+            pygame.display.update(rects)
 
 # fills barriers on the sides of the window, addition #1
 def fill_edges(win, grid):
-    for i in range(0, len(grid)):
-        grid[0][i].make_barrier()
-        grid[len(grid[0]) - 1][i].make_barrier()
-        grid[i][0].make_barrier()
-        grid[i][len(grid[0]) - 1].make_barrier()
+    mazes.border(grid.engine)
+    grid.sync()
 
 # keeps barriers, start, and end; addition #3
-def soft_reset(win, grid, rows, width):
-    win.fill(WHITE)
-
-    for i in range(rows):
-        for j in range(rows):
-            spot = grid[i][j]
-            if not spot.is_barrier() and not spot.is_start() and not spot.is_end():
-                grid[i][j].reset()    
-            spot.neighbors = []
-            grid[i][j].draw(win)
-    
-    draw_grid(win, rows, width)
-    pygame.display.update()
+# one translate over the whole state instead of a loop, then the renderer redraws everything
+SOFT_RESET_TABLE = bytes(EMPTY if state in (OPEN, CLOSED, PATH) else state for state in range(256))
+
+def soft_reset(win, grid):
+    grid.state[:] = grid.state.translate(SOFT_RESET_TABLE)
+    grid.show_terrain()
+    grid.stale = True
 
 # made a random maze generator addition #6
+# about 1 in 5 cells, the whole board in one go with numpy (mazes.py) and the edges put back after
 def randMaze(grid):
-    for row in grid:
-        for spot in row:
-            if random.randint(1, 10) < 3:
-                spot.make_barrier()
-
-def main(win, width):
+    mazes.random_density(grid.engine, 0.2)
+    mazes.border(grid.engine)
+    grid.sync()
+
+# mazes where every free cell is connected, addition #13
+def perfectMaze(grid, generator):
+    generator(grid.engine)
+    grid.sync()
+
+# start and end go in the biggest open area so the random maze always has a path, addition #12
+# finding it needs the component labels, a flood fill over the whole board, so this is a generator that
+# main runs a bit every frame (run_for) like a search, it gives back (start, end) or (None, None)
+# the labels are then already built when the first search starts
+def random_ends_steps(grid):
+    pygame.display.set_caption("Path Finding Algorithms: labeling the open areas to place start and end")
+    try:
+        components = yield from grid.engine.components_steps()
+    finally:
+        pygame.display.set_caption("Path Finding Algorithms")
+    labels = np.frombuffer(components.labels, dtype=np.intc)
+    largest = components.largest_labels()
+    # almost always a single label (a fresh labeling), == is a lot quicker than isin on a big board
+    area = np.flatnonzero(labels == largest[0] if len(largest) == 1 else np.isin(labels, largest))
+    if len(area) < 2:
+        return None, None
+    start, end = area[random.sample(range(len(area)), 2)].tolist()
+    return grid.spot(*divmod(start, grid.cols)), grid.spot(*divmod(end, grid.cols))
+
+# runs a generator for about budget_ms, gives back what it returned once it's done and None until then
+def run_for(steps, budget_ms):
+    deadline = time.perf_counter() + budget_ms / 1000
+    try:
+        while time.perf_counter() < deadline:
+            next(steps)
+    except StopIteration as done:
+        return done.value
+    return None
+
+# saving and opening the board, addition #14
+SCENARIO_FILE = "scenario.pgs"
+
+def save_board(grid, start, end):
+    scenario.save(SCENARIO_FILE, grid.engine, start.get_pos() if start else None, end.get_pos() if end else None)
+    print("saved", SCENARIO_FILE)
+
+# a new board with the saved barriers, and its start and end (None if it had none)
+def open_board():
+    with scenario.load(SCENARIO_FILE) as saved:
+        grid = make_grid(saved.rows, saved.cols)
+        grid.engine = saved.grid()
+        grid.sync()
+        start = grid.spot(*saved.start) if saved.start else None
+        end = grid.spot(*saved.end) if saved.end else None
+    if start:
+        start.make_start()
+    if end:
+        end.make_end()
+    return grid, start, end
+
+SEARCH_BUDGET_MS = 10 # how long the running search gets every frame
+
+SCROLL_KEYS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
+
+def main(win, width, rows=50, cols=None):
     global euclidean
     euclidean = 0
-    ROWS = 50
-    grid = make_grid(ROWS, width)
+    ROWS = rows
+    COLS = rows if cols is None else cols
+    grid = make_grid(ROWS, COLS)
     fill_edges(win, grid)
+    renderer = Renderer(win, grid, width)
+    clock = pygame.time.Clock()
 
     start = None
     end = None
+    planner = None # LPA* planner, only while its path is the one on screen
+    search = None # the Stepper that's running, if any
+    last_search = None # the Stepper the overlay shows, stays after it's done
+    placing = None # random_ends_steps for a new maze, until it has put down start and end
+    show_stats = False
+    brush = 1 # what the mouse paints once start and end are down, 1 is barriers and 2-9 terrain with that weight
     
     run = True
     started = False
 
     while run:
-        draw(win, grid, ROWS, width)
+        if search is not None:
+            last_search = search
+            if search.advance(SEARCH_BUDGET_MS):
+                search = None
+        if placing is not None:
+            ends = run_for(placing, SEARCH_BUDGET_MS)
+            if ends is not None:
+                placing = None
+                start, end = ends
+                if start and end:
+                    start.make_start()
+                    end.make_end()
+        if show_stats:
+            renderer.show_overlay(last_search.report() if last_search is not None else ["no search yet"])
+        began = time.perf_counter()
+        renderer.flush()
+        if search is not None: # only count drawing while a search is going, it's what competes for the frame
+            search.stats.render_seconds += time.perf_counter() - began
+        clock.tick(renderer.fps)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
+            if event.type == pygame.MOUSEWHEEL:
+                renderer.zoom(2 if event.y > 0 else 0.5, pygame.mouse.get_pos())
+
             if pygame.mouse.get_pressed()[0]: # left mouse
-                pos = pygame.mouse.get_pos()
-                row, col = get_clicked_pos(pos, ROWS, width)
+                pos = renderer.cell_at(pygame.mouse.get_pos())
                 # if click is out of range, addition #2
-                if row < 0 or col < 0 or row > len(grid) - 1 or col > len(grid[0]) - 1:
+                if pos is None:
                     continue
-                spot = grid[row][col]
+                spot = grid.spot(*pos)
+                if placing is not None: # placing things by hand, don't put the random ones on top
+                    placing.close()
+                    placing = None
+                changed = True
                 if not start and spot != end:
                    start = spot
                    start.make_start()
                 elif not end and spot != start:
                    end = spot
                    end.make_end()
-                elif spot != end and spot != start:
+                elif brush > 1 and spot != end and spot != start and not spot.is_barrier() and spot.weight() != brush:
+                   grid.set_weight(spot.index, brush)
+                elif brush == 1 and spot != end and spot != start and not spot.is_barrier():
                    spot.make_barrier()
+                else:
+                   changed = False
+                # a search can't keep going on a grid that changed under it (LPA* just starts a new compute)
+                if changed and search is not None:
+                    search.cancel()
+                    search = None
+                if changed and planner:
+                    planner.cell_changed(*pos)
+                    search = lpastar(grid, planner)
             elif pygame.mouse.get_pressed()[2]: # right mouse
-                pos = pygame.mouse.get_pos()
-                row, col = get_clicked_pos(pos, ROWS, width)
-                if row < 0 or col < 0 or row > len(grid) - 1 or col > len(grid[0]) - 1:
+                pos = renderer.cell_at(pygame.mouse.get_pos())
+                if pos is None:
                     continue
-                spot = grid[row][col]
+                spot = grid.spot(*pos)
+                if placing is not None:
+                    placing.close()
+                    placing = None
+                was_barrier = spot.is_barrier()
+                was_terrain = spot.weight() > 1
+                if search is not None and (was_barrier or was_terrain or spot == start or spot == end):
+                    search.cancel()
+                    search = None
+                if was_terrain:
+                    grid.set_weight(spot.index, 1)
                 spot.reset()
                 if spot == start:
                     start = None
+                    planner = None
                 elif spot == end:
                     end = None
+                    planner = None
+                elif (was_barrier or was_terrain) and planner:
+                    planner.cell_changed(*pos)
+                    search = lpastar(grid, planner)
 
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_e or event.key == pygame.K_d or event.key == pygame.K_m and start and end:
-                    for row in grid:
-                        for spot in row:
-                            spot.update_neighbors(grid)
+                if event.key in SCROLL_KEYS:
+                    d_rows, d_cols = SCROLL_KEYS[event.key]
+                    step = max(1, renderer.visible()[0] // 4)
+                    renderer.scroll(d_rows * step, d_cols * step)
+
+                if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    renderer.zoom(2)
+                if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    renderer.zoom(0.5)
+
+                # starting another search, clearing or resetting stops the one that's running
+                if search is not None and event.key in (pygame.K_ESCAPE, pygame.K_e, pygame.K_d, pygame.K_m, pygame.K_b,
+                                                        pygame.K_j, pygame.K_a, pygame.K_k, pygame.K_l, pygame.K_h, pygame.K_q,
+                                                        pygame.K_c, pygame.K_r, pygame.K_p, pygame.K_u, pygame.K_s, pygame.K_o):
+                    search.cancel()
+                    search = None
+                # same for placing start and end on a new maze
+                if placing is not None and event.key in (pygame.K_ESCAPE, pygame.K_c, pygame.K_r, pygame.K_p, pygame.K_u, pygame.K_o):
+                    placing.close()
+                    placing = None
+
+                if event.key in (pygame.K_e, pygame.K_d, pygame.K_m, pygame.K_b, pygame.K_j, pygame.K_a, pygame.K_k, pygame.K_h, pygame.K_q) and start and end:
+                    planner = None
                     if event.key == pygame.K_e:
                         euclidean = 1
                     if event.key == pygame.K_m or event.key == pygame.K_e:
-                        astar(lambda: draw(win, grid, ROWS, width), grid, start, end)
+                        search = astar(grid, start, end)
                         euclidean = 0
 
+                    if event.key == pygame.K_h:
+                        search = astar_alt(grid, start, end)
+
                     if event.key == pygame.K_d:
-                        dijkstra(lambda: draw(win, grid, ROWS, width), grid, start, end)
+                        search = dijkstra(grid, start, end)
+
+                    if event.key == pygame.K_q:
+                        search = dial(grid, start, end)
+
+                    if event.key == pygame.K_b:
+                        search = bfs(grid, start, end)
+
+                    if event.key == pygame.K_j:
+                        search = jps(grid, start, end)
+
+                    if event.key == pygame.K_a:
+                        search = bidirectional_astar(grid, start, end)
+
+                    if event.key == pygame.K_k:
+                        search = bidirectional_dijkstra(grid, start, end)
+
+                if event.key == pygame.K_l and start and end:
+                    planner = replan.LPAStar(grid.engine, start.get_pos(), end.get_pos())
+                    search = lpastar(grid, planner)
 
-                if event.key == pygame.K_c or event.key == pygame.K_r:
+                if event.key in (pygame.K_c, pygame.K_r, pygame.K_p, pygame.K_u):
                     start = None
                     end = None
-                    grid = make_grid(ROWS, width)
+                    planner = None
+                    grid = make_grid(ROWS, COLS)
                     fill_edges(win, grid)
-                    if event.key == pygame.K_r:
-                        randMaze(grid)
-                        draw(win, grid, ROWS, width)
-                        start = grid[random.randint(1,ROWS-2)][random.randint(1,ROWS-2)]
-                        start.make_start()
-                        end = grid[random.randint(1,ROWS-2)][random.randint(1,ROWS-2)]
-                        end.make_end()
+                    if event.key != pygame.K_c:
+                        if event.key == pygame.K_r:
+                            randMaze(grid)
+                        elif event.key == pygame.K_p:
+                            perfectMaze(grid, mazes.recursive_backtracker)
+                        else:
+                            perfectMaze(grid, mazes.kruskal)
+                        placing = random_ends_steps(grid)
+                    renderer.set_board(grid)
 
                 if event.key == pygame.K_s:
-                    soft_reset(win, grid, ROWS, width)
+                    soft_reset(win, grid)
+                    planner = None
+
+                if pygame.K_0 <= event.key <= pygame.K_9:
+                    brush = max(1, event.key - pygame.K_0)
+                    pygame.display.set_caption("painting barriers" if brush == 1 else "painting terrain with weight %d" % brush)
+
+                if event.key == pygame.K_i:
+                    show_stats = not show_stats
+                    if not show_stats:
+                        renderer.show_overlay(None)
+
+                if event.key == pygame.K_w:
+                    save_board(grid, start, end)
+
+                if event.key == pygame.K_o:
+                    try:
+                        grid, start, end = open_board()
+                    except (OSError, ValueError) as error:
+                        print("couldn't open %s: %s" % (SCENARIO_FILE, error))
+                    else:
+                        ROWS, COLS = grid.rows, grid.cols
+                        planner = None
+                        renderer.set_board(grid)
             
     pygame.quit()
 
-main(WIN, WIDTH)
+main(WIN, WIDTH, *[int(arg) for arg in sys.argv[1:3]])
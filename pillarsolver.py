@@ -0,0 +1,179 @@
+# solver for rotating pillar puzzles of any size, the Sonic Frontiers one in rotatingpillars.py is
+# PillarPuzzle(SONIC_COUPLING, 8): 4 pillars, 8 orientations, 4 rules
+# no brute force table: the rules are a linear system mod M and get solved like one
+
+# About the puzzle as a matrix
+# coupling[i][j] is how many steps pillar i turns when rule j is used once (rule j = rotating pillar j
+# and everything it drags along), so using rule j x[j] times turns the pillars by coupling @ x (mod M)
+# solving a puzzle means finding x with coupling @ x = state (mod M), where state[i] is how many
+# clockwise steps pillar i is away from where it should be
+# a rule used v times costs min(v, M - v) rotations since going M - v the other way does the same thing
+# (M / 2 counts as clockwise, same as rotatingpillars.py)
+
+# About the solving
+# Smith normal form: U @ coupling @ V = D with U and V invertible over the integers and D diagonal,
+# so coupling @ x = state becomes D @ y = U @ state with x = V @ y, one equation per pillar:
+#   d * y = c (mod M) has gcd(d, M) solutions when gcd(d, M) divides c, and none otherwise
+# every solution is one particular x plus something from the kernel (the x's that turn nothing),
+# the kernel has prod(gcd(d, M)) elements (times M for every rule that's left over), which is 1 for
+# puzzles like the Sonic one where every state has exactly one answer, so finding the cheapest answer
+# only goes over the kernel instead of all M ** N ways of using the rules
+
+from math import gcd, prod
+
+import numpy as np
+
+SONIC_COUPLING = [
+    [1, 0, 1, 0], # pillar one turns with rule one and rule three
+    [1, 1, 1, 0], # pillar two with rules one, two and three
+    [0, 0, 1, 1], # pillar three with rules three and four
+    [0, 1, 0, 1], # pillar four with rules two and four
+]
+
+MAX_KERNEL = 1 << 24 # kernels bigger than this aren't searched (it'd take too long), solve raises instead
+CHUNK = 1 << 16 # kernel elements costed at once
+
+# times a rule is used as a signed number, negative is counter-clockwise
+def signed_rotation(times, orientations):
+    times %= orientations
+    return times if times <= orientations // 2 else times - orientations
+
+# U, D, V with U @ matrix @ V = D over the integers (plain python ints, so nothing overflows)
+# D is diagonal and every diagonal entry divides the next one
+def smith_normal_form(matrix):
+    rows, cols = len(matrix), len(matrix[0]) if matrix else 0
+    d = [list(map(int, row)) for row in matrix]
+    u = [[int(i == j) for j in range(rows)] for i in range(rows)]
+    v = [[int(i == j) for j in range(cols)] for i in range(cols)]
+
+    def swap_rows(a, b):
+        d[a], d[b] = d[b], d[a]
+        u[a], u[b] = u[b], u[a]
+
+    def swap_cols(a, b):
+        for row in d:
+            row[a], row[b] = row[b], row[a]
+        for row in v:
+            row[a], row[b] = row[b], row[a]
+
+    def add_row(target, source, times): # row target += times * row source
+        d[target] = [x + times * y for x, y in zip(d[target], d[source])]
+        u[target] = [x + times * y for x, y in zip(u[target], u[source])]
+
+    def add_col(target, source, times):
+        for row in d:
+            row[target] += times * row[source]
+        for row in v:
+            row[target] += times * row[source]
+
+    for t in range(min(rows, cols)):
+        while True:
+            # the smallest nonzero entry left goes to (t, t)
+            entries = [(abs(d[i][j]), i, j) for i in range(t, rows) for j in range(t, cols) if d[i][j]]
+            if not entries:
+                return u, d, v
+            _, i, j = min(entries)
+            swap_rows(t, i)
+            swap_cols(t, j)
+            pivot = d[t][t]
+            done = True
+            for i in range(t + 1, rows): # clear the column under it, leftovers are smaller than the pivot
+                if d[i][t]:
+                    add_row(i, t, -(d[i][t] // pivot))
+                    done = done and not d[i][t]
+            for j in range(t + 1, cols): # and the row next to it
+                if d[t][j]:
+                    add_col(j, t, -(d[t][j] // pivot))
+                    done = done and not d[t][j]
+            if not done:
+                continue # a smaller entry showed up, go again with it as the pivot
+            # the pivot has to divide everything left, if it doesn't pull that row in and go again
+            bad = next((i for i in range(t + 1, rows) for j in range(t + 1, cols) if d[i][j] % pivot), None)
+            if bad is None:
+                break
+            add_row(t, bad, 1)
+        if d[t][t] < 0:
+            d[t] = [-x for x in d[t]]
+            u[t] = [-x for x in u[t]]
+    return u, d, v
+
+class Solution:
+    def __init__(self, rotations, cost):
+        self.rotations = rotations # per rule, signed: positive clockwise, negative counter-clockwise
+        self.cost = cost # total 1-step rotations
+
+    def __repr__(self):
+        return "Solution(rotations=%s, cost=%d)" % (self.rotations, self.cost)
+
+class PillarPuzzle:
+    def __init__(self, coupling, orientations=8):
+        coupling = [[value % orientations for value in row] for row in coupling]
+        if not coupling or not coupling[0] or any(len(row) != len(coupling[0]) for row in coupling):
+            raise ValueError("coupling has to be a non-empty rectangular matrix")
+        self.coupling = coupling
+        self.orientations = orientations
+        self.pillars = len(coupling)
+        self.rules = len(coupling[0])
+        self.u, d, self.v = smith_normal_form(coupling)
+        self.diagonal = [d[i][i] if i < self.rules else 0 for i in range(self.pillars)]
+
+        # the kernel: the gcd(d, M) solutions of d * y = 0 for every pivot (the multiples of M / gcd),
+        # and anything at all for the rules past the last pivot
+        m = orientations
+        generators, orders = [], []
+        for j in range(self.rules):
+            if j < self.pillars and self.diagonal[j] % m:
+                g = gcd(self.diagonal[j], m)
+                step, order = m // g, g
+            else: # d is 0 mod M (or there's no row for this rule), y can be anything
+                step, order = 1, m
+            if order > 1:
+                generators.append([(step * self.v[i][j]) % m for i in range(self.rules)])
+                orders.append(order)
+        self.kernel_size = prod(orders)
+        self._generators = np.array(generators, dtype=np.int64).reshape(len(generators), self.rules)
+        self._orders = orders
+
+    # one answer (not the cheapest) as a list of how many clockwise steps each rule is used, or None
+    def particular(self, state):
+        m = self.orientations
+        if len(state) != self.pillars:
+            raise ValueError("state has %d pillars, the puzzle has %d" % (len(state), self.pillars))
+        c = [sum(self.u[i][k] * state[k] for k in range(self.pillars)) % m for i in range(self.pillars)]
+        y = [0] * self.rules
+        for i in range(self.pillars):
+            d = self.diagonal[i] % m
+            g = gcd(d, m) # gcd(0, m) is m, so a zero row needs c = 0
+            if c[i] % g:
+                return None
+            if d:
+                modulus = m // g
+                y[i] = (c[i] // g) * pow(d // g, -1, modulus) % modulus
+        return [sum(self.v[i][j] * y[j] for j in range(self.rules)) % m for i in range(self.rules)]
+
+    def is_solvable(self, state):
+        return self.particular(state) is not None
+
+    # the cheapest answer, None when the state can't be solved
+    def solve(self, state):
+        x = self.particular(state)
+        if x is None:
+            return None
+        if self.kernel_size > MAX_KERNEL:
+            raise ValueError("the kernel has %d elements, more than MAX_KERNEL (%d)" % (self.kernel_size, MAX_KERNEL))
+        m = self.orientations
+        base = np.array(x, dtype=np.int64)
+        best, best_cost = base, None
+        # every kernel element once, CHUNK at a time: the mixed radix digits of 0..kernel_size-1 are the
+        # coefficients of the generators
+        for first in range(0, self.kernel_size, CHUNK):
+            if self._orders:
+                digits = np.array(np.unravel_index(np.arange(first, min(first + CHUNK, self.kernel_size)), self._orders))
+                candidates = (base + digits.T @ self._generators) % m
+            else:
+                candidates = base[None, :]
+            costs = np.minimum(candidates, m - candidates).sum(axis=1)
+            pick = int(costs.argmin())
+            if best_cost is None or costs[pick] < best_cost:
+                best, best_cost = candidates[pick], int(costs[pick])
+        return Solution([signed_rotation(int(times), m) for times in best], best_cost)
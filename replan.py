@@ -0,0 +1,190 @@
+# incremental replanning with LPA* (lifelong planning A*), no pygame in here either
+# the normal searches throw everything away when a barrier changes and start over,
+# LPA* keeps its g scores between searches and only repairs the cells a change affects,
+# so a few edits on a big grid cost about as much as the cells around them
+
+# About LPA*
+# every cell has g (the distance it had last time it was expanded) and rhs (one step more than
+# its best neighbor's g, a one step lookahead), a cell is consistent when they match
+# only inconsistent cells sit on the open set, ordered by [min(g, rhs) + h, min(g, rhs)]
+# when a barrier changes only that cell and its neighbors get their rhs recomputed,
+# and compute() expands just enough inconsistent cells to make the end consistent again
+# start and end are fixed for the life of a planner, make a new one if they move
+# terrain weights work too (every way into a cell costs that cell's weight), call cell_changed after set_weight
+# hooks (see About hooks in pathengine) are given to the planner and see every push,
+# stale pop and expansion it does, including the pushes from cell_changed between computes
+
+# About the self check
+# python replan.py keeps one planner per small random grid (some with terrain) through a run of random
+# barrier and weight edits, after every edit the repaired cost has to match a fresh dijkstra and the
+# path it walks back has to be a real path with that cost, it stops with an AssertionError otherwise
+
+import heapq
+import math
+import random
+import sys
+from array import array
+
+import pathengine
+
+class LPAStar:
+    def __init__(self, grid, start, end, heuristic="manhattan", hooks=None):
+        self.grid = grid
+        self.hooks = hooks
+        self.h = pathengine.HEURISTICS[heuristic]
+        self.start, self.end = pathengine._check_endpoints(grid, start, end)
+        self.end_row, self.end_col = end
+        self.g_score = array("d", [math.inf]) * len(grid)
+        self.rhs = array("d", [math.inf]) * len(grid)
+        self.rhs[self.start] = 0
+        self.open_set = []
+        self._push(self.start)
+
+    def _key(self, index):
+        best = min(self.g_score[index], self.rhs[index])
+        row, col = divmod(index, self.grid.cols)
+        return (best + self.h(row, col, self.end_row, self.end_col), best)
+
+    def _push(self, index):
+        heapq.heappush(self.open_set, self._key(index) + (index,))
+        if self.hooks is not None:
+            self.hooks.on_push(index, len(self.open_set))
+
+    # recompute rhs from the neighbors, and put the cell on the open set if it's inconsistent
+    # (the open set is lazy, old entries just get skipped when they come up)
+    def _update_cell(self, index):
+        grid = self.grid
+        if index != self.start:
+            if grid.cells[index] == pathengine.BARRIER:
+                self.rhs[index] = math.inf
+            else:
+                g_score = self.g_score
+                self.rhs[index] = min([g_score[index + step] for step in grid.steps[grid.masks[index]]], default=math.inf) \
+                    + (grid.weights[index] if grid.weights is not None else 1)
+        if self.g_score[index] != self.rhs[index]:
+            self._push(index)
+
+    # smallest key that is still live, stale entries get dropped or re-pushed with their new key
+    def _top_key(self):
+        open_set = self.open_set
+        while open_set:
+            k1, k2, index = open_set[0]
+            if self.g_score[index] == self.rhs[index]:
+                heapq.heappop(open_set)
+                if self.hooks is not None:
+                    self.hooks.on_stale(index)
+                continue
+            key = self._key(index)
+            if (k1, k2) != key:
+                heapq.heapreplace(open_set, key + (index,))
+                continue
+            return key
+        return (math.inf, math.inf)
+
+    # call after a cell turned into a barrier or stopped being one (grid.set_barrier already done)
+    def cell_changed(self, row, col):
+        grid = self.grid
+        index = grid.index(row, col)
+        self._update_cell(index)
+        for d_row, d_col in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            if grid.in_bounds(row + d_row, col + d_col):
+                self._update_cell(index + d_row * grid.cols + d_col)
+
+    def set_barrier(self, row, col, barrier=True):
+        if barrier and self.grid.index(row, col) in (self.start, self.end):
+            raise ValueError("%r is the planner's start or end, it can't be a barrier" % ((row, col),))
+        if self.grid.is_barrier(row, col) != barrier:
+            self.grid.set_barrier(row, col, barrier)
+            self.cell_changed(row, col)
+
+    # brings the end back to consistent, expanded only counts the cells this call had to fix
+    # like the pathengine *_steps searches it yields once per expanded cell, and it's fine to stop
+    # it halfway: every inconsistent cell is still on the open set so the next compute picks up from there
+    def compute_steps(self, on_closed=None):
+        grid = self.grid
+        g_score, rhs = self.g_score, self.rhs
+        end = self.end
+        expanded = peak_open = 0
+
+        while self._top_key() < self._key(end) or rhs[end] != g_score[end]:
+            if len(self.open_set) > peak_open:
+                peak_open = len(self.open_set)
+            current = heapq.heappop(self.open_set)[2]
+            expanded += 1
+            if self.hooks is not None:
+                self.hooks.on_expand(current)
+            if g_score[current] > rhs[current]: # got shorter, settle it
+                g_score[current] = rhs[current]
+            else: # got longer (or blocked), forget it and let the neighbors find something else
+                g_score[current] = math.inf
+                self._update_cell(current)
+            for step in grid.steps[grid.masks[current]]:
+                self._update_cell(current + step)
+            if on_closed is not None and current != self.start:
+                on_closed(*grid.pos(current))
+            yield
+
+        return pathengine.SearchResult(self.path(), expanded, peak_open, g_score[end] if g_score[end] < math.inf else None)
+
+    def compute(self, on_closed=None):
+        return pathengine.finish(self.compute_steps(on_closed), self.hooks)
+
+    # walks back from the end always stepping to the neighbor with the smallest g
+    def path(self):
+        grid = self.grid
+        g_score = self.g_score
+        if g_score[self.end] == math.inf:
+            return []
+        current = self.end
+        path = [grid.pos(current)]
+        while current != self.start:
+            current = min((current + step for step in grid.steps[grid.masks[current]]), key=g_score.__getitem__)
+            path.append(grid.pos(current))
+        path.reverse()
+        return path
+
+# see About the self check, gives back how many repairs were checked
+def check_repairs(grids=200, edits=60, seed=1):
+    rng = random.Random(seed)
+    checked = 0
+    for number in range(grids):
+        rows, cols = rng.randint(2, 14), rng.randint(2, 14)
+        grid = pathengine.Grid(rows, cols)
+        for index in range(len(grid)):
+            grid.cells[index] = pathengine.BARRIER if rng.random() < 0.25 else pathengine.FREE
+        grid.rebuild_masks()
+        terrain = rng.random() < 0.5
+        if terrain:
+            for row in range(rows):
+                for col in range(cols):
+                    grid.set_weight(row, col, rng.randint(1, 9))
+        start, end = rng.sample([grid.pos(index) for index in range(len(grid))], 2)
+        grid.set_barrier(*start, False)
+        grid.set_barrier(*end, False)
+        planner = LPAStar(grid, start, end)
+        for edit in range(edits):
+            where = "grid %d edit %d" % (number, edit)
+            result = planner.compute()
+            expected = pathengine.dijkstra(grid, start, end)
+            assert result.found == expected.found, where
+            if result.found:
+                assert result.cost == expected.cost, where
+                path = result.path
+                assert path[0] == start and path[-1] == end, where
+                assert all(abs(r1 - r2) + abs(c1 - c2) == 1 and not grid.is_barrier(r2, c2)
+                           for (r1, c1), (r2, c2) in zip(path, path[1:])), where
+                assert sum(grid.weight(row, col) for row, col in path[1:]) == result.cost, where
+            checked += 1
+            row, col = rng.randrange(rows), rng.randrange(cols)
+            if (row, col) in (start, end):
+                continue
+            if terrain and rng.random() < 0.4:
+                grid.set_weight(row, col, rng.randint(1, 9))
+                planner.cell_changed(row, col)
+            else:
+                planner.set_barrier(row, col, not grid.is_barrier(row, col))
+    return checked
+
+if __name__ == "__main__":
+    checked = check_repairs(seed=int(sys.argv[1]) if len(sys.argv) > 1 else 1)
+    print("LPA*: %d repaired searches matched a fresh dijkstra" % checked)
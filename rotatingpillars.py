@@ -1,4 +1,10 @@
+import argparse
+import os
+import sys
+
 import numpy as np
+
+import pillarsolver
 # By Amrit Murali on 06/10/2023
 
 # From Sonic Frontiers: ‘A Grave Mystery’ Tombstone Puzzle on Kronos Island
@@ -45,57 +51,71 @@ import numpy as np
 # - everything is zero, so everything has a solution!
 
 # Program:
+# everything is in functions so other code can import this file without it asking for input,
+# running it (python rotatingpillars.py) asks for one puzzle like before, addition #3
+
+NAMES = ["one", "two", "three", "four"]
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rotatingpillars_table.npy")
+CHUNK = 1 << 16 # lines solved at once when streaming
+
 # Getting input: the input is 2, 5, 2, 1 for the example in the comment
-pillOne = int(input("Enter how many 45-degree clockwise rotations pillar one is away from the correct direction: "))
-pillTwo = int(input("Enter how many 45-degree clockwise rotations pillar two is away from the correct direction: "))
-pillThree = int(input("Enter how many 45-degree clockwise rotations pillar three is away from the correct direction: "))
-pillFour = int(input("Enter how many 45-degree clockwise rotations pillar four is away from the correct direction: "))
-print("\nEquation: ", pillOne,  "a + ", pillTwo, "b + ", pillThree, "c + ", pillFour, "d = 0", sep='')
-
-# 1. created a 4-d array of length 8
-p = np.full((8, 8, 8, 8), -1, dtype=int)
-
-# 2. 4 nested for loops: d is # of times rule 4 is executed, c is 3, b is 2, a is 1.
-for d in range(8):
-  for c in range(8):
-    for b in range(8):
-      for a in range(8):
-        # 3. Where to store?  At the destination, which is p[(a+c)%8][(a+b+c)%8][(c+d)%8][(d+b)%8])
-        # - 1st dimension is the total movement of pillar one
-        # - pillar 1's own movement is accounted for in a, and the movement due to pillar 3's movement is c
-        # - modulus 8 is to eliminate cycles and stay inbounds in our array
-
-        # 4. What to store? One rule execution = one rotation
-        # - so the total number of rotations, which is a + b + c + d
-        # since we want the least number of rotations, we have to account for counter-clockwise rotations
-        # - ex: 7 clockwise rotations equals 1 counter-clockwise rotation, 6c = 2cc, 5c = 1cc
-        # - this results in a mapping of...only clockwise 0 | 1 | 2 | 3 | 4 | 5 | 6 | 7
-        #                                  both           0 | 1 | 2 | 3 | 4 | 3 | 2 | 1
-        # - ternary operator is used to create this mapping
-        p[(a + c) % 8][(b + a + c) % 8][(c + d) % 8][(d + b) % 8] = (a if a < 5 else 8 - a) + (b if b < 5 else 8 - b) + (c if c < 5 else 8 - c) + (d if d < 5 else 8 - d)
-
-        # Input problem: is this the correct destination?
-        if ((a + c) % 8 == pillOne and (a + b + c) % 8 == pillTwo and (c + d) % 8 == pillThree and (d + b) % 8 == pillFour):
-          print("\nMethod one: (Brute Force w/exponential runtime)")
-          # if so, print the rotations that must be done to each pillar to reach the desired outcome
-          if a < 5:
-            print("Rotate pillar one", a * 45, "degrees clockwise.")
-          else: 
-            print("Rotate pillar one", (8 - a) * 45, "degrees counter-clockwise.")
-          if b < 5:
-            print("Rotate pillar two", b * 45, "degrees clockwise.")
-          else: 
-            print("Rotate pillar two", (8 - b) * 45, "degrees counter-clockwise.")
-          if c < 5:
-            print("Rotate pillar three", c * 45, "degrees clockwise.")
-          else: 
-            print("Rotate pillar three", (8 - c) * 45, "degrees counter-clockwise.")
-          if d < 5:
-            print("Rotate pillar four", d * 45, "degrees clockwise.")
-          else: 
-            print("Rotate pillar four", (8 - d) * 45, "degrees counter-clockwise.")
-
-print("At least", p[pillOne][pillTwo][pillThree][pillFour], "45-degree rotations to reach the desired orientations.\n")
+def ask_state():
+  pillOne = int(input("Enter how many 45-degree clockwise rotations pillar one is away from the correct direction: "))
+  pillTwo = int(input("Enter how many 45-degree clockwise rotations pillar two is away from the correct direction: "))
+  pillThree = int(input("Enter how many 45-degree clockwise rotations pillar three is away from the correct direction: "))
+  pillFour = int(input("Enter how many 45-degree clockwise rotations pillar four is away from the correct direction: "))
+  return [pillOne, pillTwo, pillThree, pillFour]
+
+# 2. What to store? One rule execution = one rotation
+# - so the total number of rotations, which is a + b + c + d
+# since we want the least number of rotations, we have to account for counter-clockwise rotations
+# - ex: 7 clockwise rotations equals 1 counter-clockwise rotation, 6c = 2cc, 5c = 1cc
+# - this results in a mapping of...only clockwise 0 | 1 | 2 | 3 | 4 | 5 | 6 | 7
+#                                  both           0 | 1 | 2 | 3 | 4 | 3 | 2 | 1
+# - np.where is the ternary operator for a whole array
+def cost(rotations):
+  return np.where(rotations < 5, rotations, 8 - rotations)
+
+# method one's tables: p[pillOne][pillTwo][pillThree][pillFour] is the least number of rotations for that input,
+# executions[...] the a, b, c, d that get there
+def build_tables():
+  # 1. created a 4-d array of length 8
+  # - a, b, c, d are 4-d arrays too: a[a0][b0][c0][d0] = a0 and so on, so every combination of
+  #   rule executions is there at once and the whole table is filled with a few numpy operations
+  #   instead of 4 nested for loops (numpy broadcasting), addition #1
+  a, b, c, d = np.indices((8, 8, 8, 8))
+
+  # 3. Where to store?  At the destination, which is p[(a+c)%8][(a+b+c)%8][(c+d)%8][(d+b)%8])
+  # - 1st dimension is the total movement of pillar one
+  # - pillar 1's own movement is accounted for in a, and the movement due to pillar 3's movement is c
+  # - modulus 8 is to eliminate cycles and stay inbounds in our array
+  # - every destination gets hit exactly once (note 6), so one fancy-indexed assignment does it
+  destination = ((a + c) % 8, (a + b + c) % 8, (c + d) % 8, (d + b) % 8)
+  p = np.full((8, 8, 8, 8), -1, dtype=int)
+  p[destination] = cost(a) + cost(b) + cost(c) + cost(d)
+
+  # 4. Input problem: which rule executions land on the input? keep a, b, c, d for every destination too
+  executions = np.empty((8, 8, 8, 8, 4), dtype=int)
+  executions[destination] = np.stack((a, b, c, d), axis=-1)
+  return p, executions
+
+# Saving the table: building it is the whole brute force cost, so the first run saves it to
+# rotatingpillars_table.npy next to this file and later runs load that memory mapped instead
+# (nothing is read until a state gets looked up, and processes using the file share its pages), addition #3
+# table[pillOne][pillTwo][pillThree][pillFour] is [a, b, c, d, least number of rotations] as int8, 20 KB
+def load_table(path=TABLE_FILE, rebuild=False):
+  if rebuild or not os.path.exists(path):
+    p, executions = build_tables()
+    table = np.concatenate((executions, p[..., None]), axis=-1).astype(np.int8)
+    # written next to it first and moved over, so another run never maps half a file
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp, "wb") as file:
+      np.save(file, table)
+    os.replace(temp, path)
+  table = np.load(path, mmap_mode="r")
+  if table.shape != (8, 8, 8, 8, 5):
+    raise ValueError("%s is not a rotating pillars table, delete it or run with --rebuild" % path)
+  return table
 
 # Analysis: this solving algorithm has a runtime of c x 8^4
 # - which is O((# of orientations)^(# of pillars))
@@ -124,74 +144,145 @@ print("At least", p[pillOne][pillTwo][pillThree][pillFour], "45-degree rotations
 # d mod 8 = -3 mod 8 = 5 = 3 cc rotations
 # 14 total rotations, which is the same as method one!
 
-input = [pillOne, pillTwo, pillThree, pillFour]
-
-rota = -input[2] + input[3] - input[1] + 2 * input[0]
-rotb = input[1] - input[0]
-rotc = input[2] - input[3] + input[1] - input[0]
-rotd = input[3] - input[1] + input[0]
-
-# accounting for mod...
-rota = rota % 8
-rotb = rotb % 8
-rotc = rotc % 8
-rotd = rotd % 8
-
-# and counter-clockwise rotations...
-print("Method two: (Single, efficient solution in constant runtime")
-if rota < 5:
-  print("Rotate pillar one", rota, "times clockwise.")
-else: 
-  print("Rotate pillar one", (8 - rota), "times counter-clockwise.")
-if rotb < 5:
-  print("Rotate pillar two", rotb, "times clockwise.")
-else: 
-  print("Rotate pillar two", (8 - rotb), "times counter-clockwise.")
-if rotc < 5:
-  print("Rotate pillar three", rotc, "times clockwise.")
-else: 
-  print("Rotate pillar three", (8 - rotc), "times counter-clockwise.")
-if rotd < 5:
-  print("Rotate pillar four", rotd, "times clockwise.")
-else: 
-  print("Rotate pillar four", (8 - rotd), "times counter-clockwise.")
+# works on plain numbers and on whole numpy arrays of inputs the same way
+def method_two(input):
+  rota = -input[2] + input[3] - input[1] + 2 * input[0]
+  rotb = input[1] - input[0]
+  rotc = input[2] - input[3] + input[1] - input[0]
+  rotd = input[3] - input[1] + input[0]
+
+  # accounting for mod...
+  return rota % 8, rotb % 8, rotc % 8, rotd % 8
 
 # Method 3: checking if method one and two give the same output
-right = 0  # right prediction
-wrong = 0  # wrong prediction
-
-# making a table for using the second method...a lot of copypasta
-p2 = np.full((8, 8, 8, 8), 999, dtype=int)
-
-for d in range(8):
-  for c in range(8):
-    for b in range(8):
-      for a in range(8):
-        input[0] = a
-        input[1] = b
-        input[2] = c
-        input[3] = d
-        
-        rota = -input[2] + input[3] - input[1] + 2 * input[0]
-        rotb = input[1] - input[0]
-        rotc = input[2] - input[3] + input[1] - input[0]
-        rotd = input[3] - input[1] + input[0]
-
-        rota = rota % 8
-        rotb = rotb % 8
-        rotc = rotc % 8
-        rotd = rotd % 8
-
-        rota = rota if rota < 5 else (8 - rota)
-        rotb = rotb if rotb < 5 else (8 - rotb)
-        rotc = rotc if rotc < 5 else (8 - rotc)
-        rotd = rotd if rotd < 5 else (8 - rotd)
-
-        p2[a][b][c][d] = rota + rotb + rotc + rotd
-
-        if (p[a][b][c][d] - p2[a][b][c][d] == 0):
-          right = right + 1
-        else:
-          wrong = wrong + 1
-print("\nMethod three: (Do method one and method two yield the same results?)")   
-print(right-wrong,"out of", right+wrong)
+# making a table for using the second method, same formulas as above but on all 8^4 inputs at once
+def method_two_table():
+  rota, rotb, rotc, rotd = method_two(np.indices((8, 8, 8, 8)))
+  return cost(rota) + cost(rotb) + cost(rotc) + cost(rotd)
+
+# Batch solving: method two for lots of puzzles at once, addition #2
+# the method two formulas are a 4x4 matrix (rota = 2*input[0] - input[1] - input[2] + input[3], ...)
+# so a (K, 4) array of puzzle states times that matrix gives every puzzle's rule executions in one go
+METHOD_TWO = np.array([
+  [2, -1, -1, 1],  # rota
+  [-1, 1, 0, 0],   # rotb
+  [-1, 1, 1, -1],  # rotc
+  [1, -1, 0, 1],   # rotd
+])
+
+# states is a (K, 4) array, how many 45-degree clockwise rotations each pillar is away
+# gives back (K, 4) rotations per pillar (negative = counter-clockwise) and the K total costs
+def solve_batch(states):
+  rotations = (np.asarray(states, dtype=np.int64) @ METHOD_TWO.T) % 8
+  rotations = np.where(rotations < 5, rotations, rotations - 8)
+  return rotations, np.abs(rotations).sum(axis=1)
+
+# the same thing answered from the saved table, one fancy-indexed lookup for all K states
+def lookup(table, states):
+  states = np.asarray(states, dtype=np.int64).reshape(-1, 4) % 8
+  rows = np.asarray(table[states[:, 0], states[:, 1], states[:, 2], states[:, 3]], dtype=np.int64)
+  rotations = np.where(rows[:, :4] < 5, rows[:, :4], rows[:, :4] - 8)
+  return rotations, rows[:, 4]
+
+# Streaming: python rotatingpillars.py states.txt (or - for stdin) solves one puzzle per line, addition #4
+# - every line is four numbers (how far each pillar is away, spaces or commas in between) and gets back a line
+#   with the four rotations (negative = counter-clockwise) and the least number of rotations
+# - blank lines get a blank line back so line n of the output always answers line n of the input
+# - lines are solved CHUNK at a time (chunk=1 when someone is typing them) so big files don't go
+#   through python one puzzle at a time
+def stream(lines, out, table, chunk=CHUNK):
+  block, first = [], 1
+  for number, line in enumerate(lines, 1):
+    block.append(line)
+    if len(block) >= chunk:
+      _solve_block(block, first, out, table)
+      block, first = [], number + 1
+  if block:
+    _solve_block(block, first, out, table)
+
+def _solve_block(block, first, out, table):
+  states, filled = [], []
+  for number, line in enumerate(block, first):
+    fields = line.replace(",", " ").split()
+    if not fields:
+      continue
+    try:
+      if len(fields) != 4:
+        raise ValueError
+      states.append([int(field) for field in fields])
+    except ValueError:
+      raise ValueError("line %d: expected four whole numbers, got %r" % (number, line.strip())) from None
+    filled.append(number - first)
+  answers = [""] * len(block)
+  if states:
+    rotations, costs = lookup(table, states)
+    for row, moves, total in zip(filled, rotations.tolist(), costs.tolist()):
+      answers[row] = "%d %d %d %d %d" % (*moves, total)
+  out.write("\n".join(answers) + "\n")
+  out.flush()
+
+def interactive(table):
+  state = ask_state()
+  pillOne, pillTwo, pillThree, pillFour = state
+  print("\nEquation: ", pillOne,  "a + ", pillTwo, "b + ", pillThree, "c + ", pillFour, "d = 0", sep='')
+  p = table[..., 4]
+
+  print("\nMethod one: (Brute Force w/exponential runtime)")
+  # print the rotations that must be done to each pillar to reach the desired outcome
+  for name, times in zip(NAMES, table[pillOne, pillTwo, pillThree, pillFour, :4].tolist()):
+    if times < 5:
+      print("Rotate pillar", name, times * 45, "degrees clockwise.")
+    else:
+      print("Rotate pillar", name, (8 - times) * 45, "degrees counter-clockwise.")
+
+  print("At least", p[pillOne][pillTwo][pillThree][pillFour], "45-degree rotations to reach the desired orientations.\n")
+
+  # and counter-clockwise rotations...
+  print("Method two: (Single, efficient solution in constant runtime")
+  for name, times in zip(NAMES, method_two(state)):
+    if times < 5:
+      print("Rotate pillar", name, times, "times clockwise.")
+    else:
+      print("Rotate pillar", name, (8 - times), "times counter-clockwise.")
+
+  p2 = method_two_table()
+  right = int((p == p2).sum())  # right prediction
+  wrong = p.size - right  # wrong prediction
+  print("\nMethod three: (Do method one and method two yield the same results?)")
+  print(right-wrong,"out of", right+wrong)
+
+  # Method four: the same puzzle through the general solver in pillarsolver.py
+  # it treats the rules as a linear system mod 8 (Smith normal form) so it works for any number of pillars,
+  # orientations and rules, without a table of every possible state
+  solution = pillarsolver.PillarPuzzle(pillarsolver.SONIC_COUPLING, 8).solve(state)
+  print("\nMethod four: (General solver, any number of pillars)")
+  for name, times in zip(NAMES, solution.rotations):
+    if times >= 0:
+      print("Rotate pillar", name, times, "times clockwise.")
+    else:
+      print("Rotate pillar", name, -times, "times counter-clockwise.")
+  print("At least", solution.cost, "45-degree rotations to reach the desired orientations.")
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Solve the Sonic Frontiers rotating pillars puzzle.")
+  parser.add_argument("states", nargs="?",
+                      help="file with one puzzle per line to solve them all (- for stdin), leave out to get asked for one")
+  parser.add_argument("--table", default=TABLE_FILE, help="where the solution table is saved")
+  parser.add_argument("--rebuild", action="store_true", help="build the table again even if the file is there")
+  args = parser.parse_args(argv)
+
+  table = load_table(args.table, args.rebuild)
+  if args.states is None:
+    interactive(table)
+    return
+  try:
+    if args.states == "-":
+      stream(sys.stdin, sys.stdout, table, 1 if sys.stdin.isatty() else CHUNK)
+    else:
+      with open(args.states) as lines:
+        stream(lines, sys.stdout, table)
+  except ValueError as error:
+    parser.exit(1, "%s: %s\n" % (parser.prog, error))
+
+if __name__ == "__main__":
+  main()
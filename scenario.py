@@ -0,0 +1,122 @@
+# saves a grid (plus start, end and optionally a list of queries) to a small binary file and loads it back
+# so a slow case can be kept and run again later, by the visualizer, benchmark.py or batch.py
+
+# About the file
+# a 40 byte header, then the barriers packed 8 cells to a byte, then the terrain weights if there are any, then the queries
+#   header: b"PGSC", format version (u16), flags (u16, bit 0 set when there are weights), rows, cols (u32),
+#           start row, start col, end row, end col (i32, -1 when there's no start/end), query count (u32),
+#           4 unused bytes
+#   bitmap: bit i of the bitmap (little endian bit order) is 1 when cell i is a barrier,
+#           padded with zeros to a multiple of 8 bytes so the queries stay aligned
+#   weights: only with flag bit 0, one byte per cell (grid.weights), padded the same way
+#   queries: query count rows of start row, start col, end row, end col (i32)
+# everything is little endian, a 4000x4000 map is 2 MB instead of 16
+
+# About loading
+# load() memory maps the file and only reads the header, the bitmap and queries are numpy views
+# straight onto the mapping (read-only, nothing parsed or copied) so several processes opening the same
+# file share its pages, Scenario.grid() unpacks the bitmap into a new pathengine.Grid in one numpy call
+# the searches need a grid of their own (bytearray cells, masks), so that unpacked grid is a private copy:
+# batch.solve("file.pgs", ...) has every worker map the file and unpack it once for all its queries,
+# benchmark.py --scenario unpacks it once per file
+
+import mmap
+import struct
+
+import numpy as np
+
+import pathengine
+
+MAGIC = b"PGSC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIiiiiI4x")
+HAS_WEIGHTS = 1
+
+class Scenario:
+    def __init__(self, rows, cols, bitmap, start=None, end=None, queries=None, mapping=None, weights=None):
+        self.rows = rows
+        self.cols = cols
+        self.bitmap = bitmap
+        self.weights = weights # numpy view of the weights, None when the grid had none
+        self.start = start
+        self.end = end
+        self.queries = queries # numpy array of shape (count, 4): start row, start col, end row, end col
+        self._mapping = mapping
+
+    # a fresh grid with the scenario's barriers and weights, changing it doesn't touch the file
+    def grid(self):
+        grid = pathengine.Grid(self.rows, self.cols)
+        size = self.rows * self.cols
+        np.frombuffer(grid.cells, dtype=np.uint8)[:] = np.unpackbits(self.bitmap, count=size, bitorder="little")
+        grid.rebuild_masks()
+        if self.weights is not None:
+            grid.weights = bytearray(self.weights)
+            grid.max_weight = max(1, int(self.weights.max(initial=1)))
+        return grid
+
+    # the queries as ((start_row, start_col), (end_row, end_col)) pairs like benchmark.py and batch.py use
+    def query_pairs(self):
+        return [((a, b), (c, d)) for a, b, c, d in self.queries.tolist()]
+
+    # the numpy views point into the mapping, drop them before closing
+    def close(self):
+        if self._mapping is not None:
+            self.bitmap = self.queries = self.weights = None
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _bitmap_bytes(rows, cols):
+    return -(-rows * cols // 64) * 8
+
+def _weight_bytes(rows, cols):
+    return -(-rows * cols // 8) * 8
+
+# start and end are (row, col) or None, queries a list of ((start_row, start_col), (end_row, end_col))
+def save(path, grid, start=None, end=None, queries=()):
+    queries = np.asarray([(a, b, c, d) for (a, b), (c, d) in queries], dtype="<i4").reshape(-1, 4)
+    start_row, start_col = start if start is not None else (-1, -1)
+    end_row, end_col = end if end is not None else (-1, -1)
+    bitmap = np.packbits(np.frombuffer(bytes(grid.cells), dtype=np.uint8) == pathengine.BARRIER, bitorder="little")
+    padding = _bitmap_bytes(grid.rows, grid.cols) - len(bitmap)
+    flags = HAS_WEIGHTS if grid.weighted else 0
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, grid.rows, grid.cols,
+                               start_row, start_col, end_row, end_col, len(queries)))
+        file.write(bitmap.tobytes())
+        file.write(bytes(padding))
+        if grid.weighted:
+            file.write(grid.weights)
+            file.write(bytes(_weight_bytes(grid.rows, grid.cols) - len(grid.weights)))
+        file.write(queries.tobytes())
+
+def load(path):
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapping) < HEADER.size:
+        mapping.close()
+        raise ValueError("%s is too short to be a scenario file" % path)
+    magic, version, flags, rows, cols, start_row, start_col, end_row, end_col, count = HEADER.unpack_from(mapping)
+    if magic != MAGIC or version != VERSION:
+        mapping.close()
+        raise ValueError("%s is not a version %d scenario file" % (path, VERSION))
+    bitmap_size = _bitmap_bytes(rows, cols)
+    weight_size = _weight_bytes(rows, cols) if flags & HAS_WEIGHTS else 0
+    expected = HEADER.size + bitmap_size + weight_size + 16 * count
+    if len(mapping) != expected:
+        mapping.close()
+        raise ValueError("%s is %d bytes, expected %d" % (path, len(mapping), expected))
+    bitmap = np.frombuffer(mapping, dtype=np.uint8, count=bitmap_size, offset=HEADER.size)
+    weights = None
+    if flags & HAS_WEIGHTS:
+        weights = np.frombuffer(mapping, dtype=np.uint8, count=rows * cols, offset=HEADER.size + bitmap_size)
+    queries = np.frombuffer(mapping, dtype="<i4", count=4 * count,
+                            offset=HEADER.size + bitmap_size + weight_size).reshape(count, 4)
+    start = (start_row, start_col) if start_row >= 0 else None
+    end = (end_row, end_col) if end_row >= 0 else None
+    return Scenario(rows, cols, bitmap, start, end, queries, mapping, weights)